@@ -0,0 +1,84 @@
+"""Atomares Schreiben von Dateien und Inhalts-Hashes.
+
+atomic_write() erzeugt eine Datei über eine temporäre Datei im selben
+Verzeichnis, die per fsync gesichert und erst dann an ihren Platz verschoben
+wird. Verwendet von Partituren, Undo-Journal, Mapping-Profilen und dem
+Katalog-Cache.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+# Blockgröße beim Berechnen von Hashes
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def atomic_write(target_path, produce, before_replace=None):
+    """Erzeugt target_path über eine temporäre Datei im selben Verzeichnis.
+
+    produce(tmp_path) schreibt den Inhalt. Die Datei wird per fsync auf die
+    Platte gebracht und erst dann per os.replace an ihren Platz verschoben,
+    sodass target_path immer entweder vollständig alt oder vollständig neu ist.
+    before_replace(tmp_path) wird unmittelbar vor dem Ersetzen aufgerufen.
+    Ist target_path ein symbolischer Link, wird sein Ziel ersetzt, nicht der Link.
+    """
+    target_path = os.path.realpath(target_path)
+    target_dir = os.path.dirname(target_path)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix='.mapper-', suffix='.tmp')
+    os.close(fd)
+    try:
+        result = produce(tmp_path)
+        _fsync_path(tmp_path)
+        if os.path.exists(target_path):
+            shutil.copymode(target_path, tmp_path)
+        else:
+            # mkstemp legt die Datei mit 0600 an, neue Dateien sollen wie üblich entstehen
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+        if before_replace is not None:
+            before_replace(tmp_path)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(target_dir)
+    return result
+
+
+def _current_umask():
+    # Die umask lässt sich nur durch Setzen auslesen; das passiert einmal beim Import,
+    # bevor Threads laufen
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _current_umask()
+
+
+def _fsync_path(path):
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_directory(directory):
+    """Macht das Umbenennen dauerhaft (unter Windows nicht möglich und nicht nötig)."""
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_digest(path):
+    """SHA-256 des Dateiinhalts, blockweise gelesen."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
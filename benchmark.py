@@ -0,0 +1,327 @@
+"""Benchmarks für Analyse, Speichern und Laden des Sound-Katalogs (ohne GUI).
+
+Erzeugt synthetische MusicXML-Partituren und MuseHub/MuseScore-Metadaten,
+misst die Kernschritte und gibt die Ergebnisse als JSON aus, damit
+Versionen miteinander verglichen werden können.
+
+Beispiel:
+    python benchmark.py --parts 60 --measures 400 --mxl --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+import zipfile
+
+from instrument_classifier import InstrumentClassifier
+from mapper_core import apply_sound_mappings, prescan, read_score_header, sound_mapping_keys, write_score
+from sound_catalog import load_sound_libraries
+
+MUSICXML_NAMESPACE = "http://www.musicxml.org/ns/partwise"
+ENTRY_POINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'musicxml-instrument-mapper.py')
+
+# Instrumente für die synthetischen Partituren: (Part-Name, instrument-sound)
+SCORE_INSTRUMENTS = [
+    ("Violin I", "strings.violin"), ("Violin II", "strings.violin"), ("Viola", "strings.viola"),
+    ("Violoncello", "strings.cello"), ("Contrabass", "strings.contrabass"),
+    ("Flute", "wind.flutes.flute"), ("Oboe", "wind.reed.oboe"), ("Clarinet in Bb", "wind.reed.clarinet"),
+    ("Bassoon", "wind.reed.bassoon"), ("Horn in F", "brass.french-horn"),
+    ("Trumpet in Bb", "brass.trumpet"), ("Trombone", "brass.trombone"), ("Tuba", "brass.tuba"),
+    ("Timpani", "drum.timpani"), ("Piano", "keyboard.piano")
+]
+
+SOUND_WORDS = ["violin", "viola", "cello", "bass", "flute", "oboe", "clarinet", "bassoon",
+               "horn", "trumpet", "trombone", "tuba", "timpani", "cymbals", "piano", "choir"]
+SOUND_CATEGORIES = ["strings", "woodwinds", "woodwinds", "brass", "percussion", "keys"]
+PUBLISHERS = ["Muse", "CineSamples", "Orchestral Tools", "Spitfire"]
+
+
+def generate_score(path, parts=20, measures=100, notes=8, namespace=False, compressed=False,
+                   instruments=1):
+    """Schreibt eine synthetische score-partwise-Partitur nach path (.mxl bei compressed).
+
+    instruments legt die Anzahl <score-instrument> pro Part fest (z.B. Schlagzeug-Sets).
+    """
+    xml_path = path + '.musicxml' if compressed else path
+    xmlns = f' xmlns="{MUSICXML_NAMESPACE}"' if namespace else ''
+    duration = max(1, 16 // notes)
+
+    with open(xml_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n')
+        f.write('<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 4.0 Partwise//EN" '
+                '"http://www.musicxml.org/dtds/partwise.dtd">\n')
+        f.write(f'<score-partwise version="4.0"{xmlns}>\n')
+        f.write('  <work>\n    <work-title>Benchmark</work-title>\n  </work>\n')
+        f.write('  <part-list>\n')
+        for idx in range(parts):
+            name, sound = SCORE_INSTRUMENTS[idx % len(SCORE_INSTRUMENTS)]
+            part_id = f"P{idx + 1}"
+            f.write(f'    <score-part id="{part_id}">\n'
+                    f'      <part-name>{name}</part-name>\n')
+            for number in range(1, instruments + 1):
+                f.write(f'      <score-instrument id="{part_id}-I{number}">\n'
+                        f'        <instrument-name>{name} {number}</instrument-name>\n'
+                        f'        <instrument-sound>{sound}</instrument-sound>\n'
+                        f'      </score-instrument>\n')
+            for number in range(1, instruments + 1):
+                f.write(f'      <midi-instrument id="{part_id}-I{number}">\n'
+                        f'        <midi-channel>{idx % 16 + 1}</midi-channel>\n'
+                        f'        <midi-program>1</midi-program>\n'
+                        f'      </midi-instrument>\n')
+            f.write('    </score-part>\n')
+        f.write('  </part-list>\n')
+
+        note = (f'      <note>\n        <pitch>\n          <step>C</step>\n          <octave>4</octave>\n'
+                f'        </pitch>\n        <duration>{duration}</duration>\n        <voice>1</voice>\n'
+                f'        <type>eighth</type>\n      </note>\n')
+        measure_notes = note * notes
+        for idx in range(parts):
+            f.write(f'  <part id="P{idx + 1}">\n')
+            for number in range(1, measures + 1):
+                f.write(f'    <measure number="{number}">\n')
+                if number == 1:
+                    f.write('      <attributes>\n        <divisions>4</divisions>\n      </attributes>\n')
+                f.write(measure_notes)
+                f.write('    </measure>\n')
+            f.write('  </part>\n')
+        f.write('</score-partwise>\n')
+
+    if compressed:
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(zipfile.ZipInfo('mimetype'), 'application/vnd.recordare.musicxml')
+            zf.writestr('META-INF/container.xml',
+                        '<?xml version="1.0" encoding="UTF-8"?>\n<container><rootfiles>'
+                        '<rootfile full-path="score.musicxml" '
+                        'media-type="application/vnd.recordare.musicxml+xml"/>'
+                        '</rootfiles></container>\n')
+            zf.write(xml_path, 'score.musicxml')
+        os.remove(xml_path)
+    return path
+
+
+def generate_metadata(directory, sounds=10000, files=2):
+    """Erzeugt abwechselnd MuseHub- und MuseScore-Metadaten mit insgesamt sounds Einträgen."""
+    paths = []
+    per_file = max(1, sounds // files)
+    for file_idx in range(files):
+        entries = []
+        for idx in range(per_file):
+            number = file_idx * per_file + idx
+            word = SOUND_WORDS[number % len(SOUND_WORDS)]
+            category = SOUND_CATEGORIES[number % len(SOUND_CATEGORIES)]
+            publisher = PUBLISHERS[number % len(PUBLISHERS)]
+            sound_id = f"{category}.{word}.{publisher.lower().replace(' ', '')}.{number}"
+            entries.append({'id': sound_id, 'publisher': publisher,
+                            'displayName': f"{word.title()} {number}"})
+
+        data = {'sounds': entries} if file_idx % 2 == 0 else entries
+        path = os.path.join(directory, f"metadata-{file_idx}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        paths.append(path)
+    return paths
+
+
+def measure(name, func, repeat=5, setup=None):
+    """Misst func repeat-mal und einmal zusätzlich mit tracemalloc für den Speicherbedarf."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'name': name,
+        'repeat': repeat,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'max_s': max(timings),
+        'peak_memory_bytes': peak
+    }
+
+
+def measure_startup(repeat=10):
+    """Kaltstart der Kommandozeile in frischen Interpretern (wie `python -X importtime`).
+
+    Misst die Laufzeit von `musicxml-instrument-mapper.py --help` im Vergleich
+    zu einem leeren Interpreter, die kumulierten Importzeiten des CLI-Pfads
+    und ob dabei tkinter geladen wird.
+    """
+    def run(command):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - start)
+        return {'min_s': min(timings), 'median_s': statistics.median(timings)}
+
+    interpreter = run([sys.executable, '-c', 'pass'])
+    cli = run([sys.executable, ENTRY_POINT, '--help'])
+
+    # -X importtime schreibt "import time: self | cumulative | modul" nach stderr
+    probe = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', "import sys, mapper_cli; print('tkinter' in sys.modules)"],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(ENTRY_POINT)
+    )
+    imports = []
+    for line in probe.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            own = int(fields[0].rsplit(':', 1)[-1])
+            imports.append((own, int(fields[1]), fields[2].strip()))
+
+    return {
+        'name': 'cli_cold_start',
+        'repeat': repeat,
+        'interpreter_s': interpreter,
+        'cli_help_s': cli,
+        'cli_overhead_ms': round((cli['median_s'] - interpreter['median_s']) * 1000, 1),
+        'import_mapper_cli_ms': round(max((c for _, c, name in imports if name == 'mapper_cli'), default=0) / 1000, 1),
+        # Module mit der größten eigenen Importzeit (ohne ihre Unterimporte)
+        'slowest_imports_ms': [[name, round(own / 1000, 1)] for own, _, name in sorted(imports, reverse=True)[:10]],
+        'imports_tkinter': probe.stdout.strip() == 'True'
+    }
+
+
+def run_benchmarks(args, workdir):
+    results = []
+    suffix = '.mxl' if args.mxl else '.musicxml'
+    score = generate_score(os.path.join(workdir, 'score' + suffix), args.parts, args.measures,
+                           args.notes, args.namespace, args.mxl, args.instruments)
+    target = os.path.join(workdir, 'saved' + suffix)
+
+    # Vergleichswert: vollständiges Parsen, wie es die erste Version bei jeder Analyse tat
+    if not args.mxl:
+        results.append(measure('parse_full_tree', lambda: ET.parse(score), args.repeat))
+
+    results.append(measure('prescan', lambda: prescan(score), args.repeat))
+    results.append(measure('analyze_header', lambda: read_score_header(score), args.repeat))
+
+    header = read_score_header(score)
+    mappings = {}
+    for part in header.parts:
+        for key, _ in sound_mapping_keys(part):
+            mappings[key] = f"bench.sound.{len(mappings)}"
+
+    def save():
+        apply_sound_mappings(header, mappings)
+        write_score(header, target)
+    results.append(measure('save_splice', save, args.repeat))
+
+    def save_full_tree():
+        fallback = read_score_header(score)
+        fallback.part_list_span = None
+        apply_sound_mappings(fallback, mappings)
+        write_score(fallback, target)
+    results.append(measure('save_full_tree', save_full_tree, args.repeat))
+
+    # Sound-Katalog: kalt (ohne Cache), Cache anlegen, warm (aus dem Cache)
+    metadata_dir = os.path.join(workdir, 'metadata')
+    os.makedirs(metadata_dir)
+    metadata_files = generate_metadata(metadata_dir, args.sounds, args.metadata_files)
+    cache_path = os.path.join(workdir, 'cache', 'sound-catalog.json')
+
+    def remove_cache():
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+    results.append(measure(
+        'catalog_load_cold',
+        lambda: load_sound_libraries(metadata_files, cache_path, use_cache=False), args.repeat))
+    load_sound_libraries(metadata_files, cache_path)
+    results.append(measure(
+        'catalog_load_warm', lambda: load_sound_libraries(metadata_files, cache_path), args.repeat))
+    results.append(measure(
+        'catalog_load_rebuild_cache', lambda: load_sound_libraries(metadata_files, cache_path),
+        args.repeat, setup=remove_cache))
+
+    catalog, _ = load_sound_libraries(metadata_files, cache_path)
+    results.append(measure('catalog_build_index', catalog.build_index, args.repeat))
+    results.append(measure('catalog_search', lambda: catalog.search('viol', limit=200), args.repeat))
+
+    results.append(measure('classifier_compile', InstrumentClassifier, args.repeat))
+    classifier = InstrumentClassifier()
+    sound_ids = list(catalog.display_names.items())
+
+    def classify_all():
+        for sound_id, display_name in sound_ids:
+            classifier.classify(sound_id, display_name)
+    results.append(measure('classify_sounds', classify_all, args.repeat))
+
+    return {
+        'score_bytes': os.path.getsize(score),
+        'results': results
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Misst die Kernschritte des MusicXML Instrument Mappers.")
+    parser.add_argument('--parts', type=int, default=30, help="Anzahl Parts der Partitur")
+    parser.add_argument('--measures', type=int, default=200, help="Takte pro Part")
+    parser.add_argument('--notes', type=int, default=8, help="Noten pro Takt")
+    parser.add_argument('--instruments', type=int, default=1, help="score-instruments pro Part")
+    parser.add_argument('--namespace', action='store_true', help="MusicXML-Namespace im Root-Element setzen")
+    parser.add_argument('--mxl', action='store_true', help="Partitur als komprimierte .mxl-Datei erzeugen")
+    parser.add_argument('--sounds', type=int, default=20000, help="Anzahl Sounds in den Metadaten")
+    parser.add_argument('--metadata-files', type=int, default=2, help="Anzahl Metadaten-Dateien")
+    parser.add_argument('--repeat', type=int, default=5, help="Wiederholungen pro Messung")
+    parser.add_argument('--output', help="JSON-Ergebnis in diese Datei schreiben (Standard: stdout)")
+    parser.add_argument('--keep', action='store_true', help="Erzeugte Dateien nicht löschen")
+    parser.add_argument('--startup-only', action='store_true', help="Nur den Kaltstart der Kommandozeile messen")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.startup_only:
+        report = {'results': []}
+    else:
+        workdir = tempfile.mkdtemp(prefix='mapper-bench-')
+        try:
+            report = run_benchmarks(args, workdir)
+        finally:
+            if args.keep:
+                print(f"Dateien in {workdir}", file=sys.stderr)
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+    report['results'].append(measure_startup(args.repeat))
+
+    report['config'] = {key: value for key, value in vars(args).items()
+                        if key not in ('output', 'keep', 'startup_only')}
+    report['environment'] = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
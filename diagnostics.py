@@ -0,0 +1,182 @@
+"""Optionale Zeitmessung der einzelnen Arbeitsschritte.
+
+Die Messung ist standardmäßig aus und kostet dann nur einen Funktionsaufruf
+pro Schritt. Eingeschaltet wird sie über die Umgebungsvariable
+MUSICXML_MAPPER_DIAGNOSTICS=1 oder die Kommandozeilenoptionen der Werkzeuge.
+Die Ergebnisse lassen sich als Zusammenfassung (JSON) oder im Trace-Event-
+Format (chrome://tracing, Perfetto) exportieren.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ENV_VARIABLE = 'MUSICXML_MAPPER_DIAGNOSTICS'
+
+
+class _NullPhase:
+    """Wird zurückgegeben, wenn die Messung ausgeschaltet ist."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, name, value=1):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, recorder, name, counts):
+        self.recorder = recorder
+        self.name = name
+        self.counts = counts
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder._add_event(self.name, self.start, time.perf_counter(), self.counts)
+        return False
+
+    def add(self, name, value=1):
+        """Zähler, der mit dem Schritt gespeichert wird (z.B. Anzahl Parts)."""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+
+class Recorder:
+    """Sammelt Zeitspannen (Schritt, Start, Dauer, Prozess, Thread, Zähler)."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self._lock = threading.Lock()
+
+    def phase(self, name, **counts):
+        """Kontextmanager, der die Dauer eines Schritts misst."""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name, counts)
+
+    def _add_event(self, name, start, end, counts):
+        event = {
+            'name': name,
+            # perf_counter ist unter Linux systemweit monoton, Worker-Prozesse passen also zusammen
+            'start': start,
+            'duration': end - start,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'counts': counts
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def drain(self):
+        """Liefert alle Ereignisse und leert die Liste (z.B. in Worker-Prozessen)."""
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def merge(self, events):
+        with self._lock:
+            self.events.extend(events)
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+
+    def summary(self):
+        """Pro Schritt: Anzahl, Gesamt-, Mittel- und Höchstdauer (ms) und summierte Zähler."""
+        phases = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            phase = phases.setdefault(event['name'], {
+                'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'counts': {}
+            })
+            duration = event['duration'] * 1000
+            phase['calls'] += 1
+            phase['total_ms'] += duration
+            phase['max_ms'] = max(phase['max_ms'], duration)
+            for key, value in event['counts'].items():
+                phase['counts'][key] = phase['counts'].get(key, 0) + value
+        for phase in phases.values():
+            phase['mean_ms'] = phase['total_ms'] / phase['calls']
+        return phases
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'phases': self.summary(), 'events': self.events}, f, indent=2)
+
+    def export_trace(self, path):
+        """Schreibt die Ereignisse im Trace-Event-Format (Zeiten in Mikrosekunden)."""
+        origin = min((event['start'] for event in self.events), default=0)
+        trace = [{
+            'name': event['name'],
+            'cat': event['name'].split('.', 1)[0],
+            'ph': 'X',
+            'ts': round((event['start'] - origin) * 1e6, 1),
+            'dur': round(event['duration'] * 1e6, 1),
+            'pid': event['pid'],
+            'tid': event['tid'],
+            'args': event['counts']
+        } for event in self.events]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+recorder = Recorder(enabled=os.environ.get(ENV_VARIABLE, '') not in ('', '0'))
+
+
+def phase(name, **counts):
+    return recorder.phase(name, **counts)
+
+
+def enable():
+    """Schaltet die Messung ein, auch für später gestartete Worker-Prozesse."""
+    recorder.enabled = True
+    os.environ[ENV_VARIABLE] = '1'
+
+
+def is_enabled():
+    return recorder.enabled
+
+
+@contextmanager
+def profiled(cprofile_path=None, tracemalloc_top=0, stream=None):
+    """Führt den Block unter cProfile und/oder tracemalloc aus.
+
+    Das cProfile-Ergebnis wird nach cprofile_path geschrieben (für pstats,
+    snakeviz usw.), von tracemalloc werden die tracemalloc_top größten
+    Speicherverbraucher und die Spitze nach stream ausgegeben.
+    """
+    profiler = None
+    if cprofile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+    if tracemalloc_top:
+        import tracemalloc
+        tracemalloc.start()
+
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        if tracemalloc_top:
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            lines = [f"Speicherspitze: {peak / 1024:.1f} KiB"]
+            for stat in snapshot.statistics('lineno')[:tracemalloc_top]:
+                lines.append(str(stat))
+            print('\n'.join(lines), file=stream)
@@ -0,0 +1,68 @@
+"""Fenster mit den gemessenen Zeiten der Arbeitsschritte (siehe diagnostics.py)."""
+import json
+import tkinter as tk
+from tkinter import filedialog, ttk
+
+import diagnostics
+
+# Spalten der Tabelle: (Schlüssel, Überschrift, Breite)
+COLUMNS = [
+    ('phase', "Schritt", 200),
+    ('calls', "Aufrufe", 70),
+    ('total_ms', "Gesamt (ms)", 100),
+    ('mean_ms', "Mittel (ms)", 100),
+    ('max_ms', "Max (ms)", 100),
+    ('counts', "Zähler", 260)
+]
+
+
+class DiagnosticsPanel:
+    """Zeigt die Zusammenfassung des globalen Recorders und exportiert sie."""
+
+    def __init__(self, parent):
+        self.window = tk.Toplevel(parent)
+        self.window.title("Diagnose")
+        self.window.geometry("860x360")
+
+        frame = ttk.Frame(self.window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        self.tree = ttk.Treeview(frame, columns=[key for key, _, _ in COLUMNS], show='headings')
+        for key, heading, width in COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, stretch=key in ('phase', 'counts'),
+                             anchor=tk.W if key in ('phase', 'counts') else tk.E)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+        buttons = ttk.Frame(frame)
+        buttons.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(buttons, text="Aktualisieren", command=self.refresh).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Zurücksetzen", command=self.reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Trace exportieren...", command=self.export_trace).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="JSON exportieren...", command=self.export_json).pack(side=tk.RIGHT, padx=5)
+
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for name, phase in sorted(diagnostics.recorder.summary().items()):
+            self.tree.insert('', tk.END, values=[
+                name, phase['calls'], f"{phase['total_ms']:.2f}", f"{phase['mean_ms']:.2f}",
+                f"{phase['max_ms']:.2f}", json.dumps(phase['counts'], ensure_ascii=False)
+            ])
+
+    def reset(self):
+        diagnostics.recorder.clear()
+        self.refresh()
+
+    def export_json(self):
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if path:
+            diagnostics.recorder.export_json(path)
+
+    def export_trace(self):
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".json",
+                                            filetypes=[("Trace Event JSON", "*.json")])
+        if path:
+            diagnostics.recorder.export_trace(path)
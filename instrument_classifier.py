@@ -0,0 +1,156 @@
+"""Erkennung der Instrumentenkategorie aus Part-Namen und Sound-IDs.
+
+Alle Schlüsselwörter werden in einen einzigen regulären Ausdruck kompiliert
+(als Präfixbaum, damit die Regex-Engine gemeinsame Anfänge nur einmal prüft).
+Pro Text genügt ein Durchlauf; bei mehreren Treffern gewinnt der längste,
+sodass z.B. "Bassoon" und "Bass Clarinet" nicht als "bass" (Strings) enden.
+Bei gleicher Länge gewinnt der spätere Treffer, da das Grundwort meist am
+Ende steht ("Piccolo Trumpet").
+"""
+import re
+
+# Schlüsselwörter (auch als Teil zusammengesetzter Wörter, z.B. "Kontrabass")
+INSTRUMENT_KEYWORDS = {
+    "Strings": [
+        "strings", "string", "streicher",
+        "violin", "violine", "violino", "violon", "geige", "fiddle",
+        "viola", "bratsche",
+        "cello", "violoncello", "violoncelle",
+        "bass", "double bass", "contrabass", "kontrabass", "contrebasse", "string bass",
+        "harp", "harfe", "harpe", "arpa"
+    ],
+    "Woodwinds": [
+        "woodwinds", "woodwind", "winds", "holzbläser",
+        "flute", "flöte", "floete", "flauto", "flûte", "piccolo", "pikkolo", "alto flute",
+        "oboe", "hautbois", "english horn", "cor anglais", "englischhorn", "englisch horn",
+        "clarinet", "klarinette", "clarinetto", "clarinette", "bass clarinet", "bassklarinette",
+        "bassoon", "fagott", "fagotto", "basson", "contrabassoon", "kontrafagott",
+        "saxophone", "saxofon", "saxophon", "sax", "recorder", "blockflöte"
+    ],
+    "Brass": [
+        "brass", "blechbläser",
+        "trumpet", "trompete", "tromba", "trompette", "cornet", "kornett", "flugelhorn", "flügelhorn",
+        "horn", "french horn", "waldhorn", "corno",
+        "trombone", "posaune", "bass trombone", "bassposaune", "altposaune",
+        "tuba", "euphonium", "baritone horn", "tenorhorn"
+    ],
+    "Percussion": [
+        "percussion", "perkussion", "schlagzeug", "schlagwerk", "drums", "drum", "drumset", "drum set",
+        "timpani", "pauke", "pauken", "timbales",
+        "bass drum", "große trommel", "snare", "snare drum", "kleine trommel",
+        "cymbal", "cymbals", "becken", "triangle", "triangel", "tam-tam", "gong", "tambourine",
+        "glockenspiel", "xylophone", "xylophon", "marimba", "vibraphone", "vibraphon", "tubular bells",
+        "röhrenglocken", "crotales"
+    ],
+    "Keys": [
+        "keys", "keyboard", "piano", "klavier", "pianoforte", "flügel", "grand piano",
+        "celesta", "celeste", "harpsichord", "cembalo", "organ", "orgel", "synth"
+    ]
+}
+
+# Abkürzungen aus Partituren; sie zählen nur als eigenständiges Wort ("Vln.", nicht "Violine")
+INSTRUMENT_ABBREVIATIONS = {
+    "Strings": ["vl", "vln", "vn", "vni", "va", "vla", "br", "vc", "vlc", "vcl", "cb", "kb", "hp", "hrf"],
+    "Woodwinds": ["fl", "picc", "ob", "eh", "ca", "cl", "clar", "klar", "bcl", "bsn", "fg", "fag", "cbsn", "sx"],
+    "Brass": ["hn", "hr", "cor", "tpt", "trp", "tr", "trb", "tbn", "pos", "tba", "euph"],
+    "Percussion": ["timp", "pk", "perc", "sd", "bd", "cym", "glk", "xyl", "mar", "vib"],
+    "Keys": ["pno", "pf", "klav", "cel", "hpd", "cemb", "org"]
+}
+
+_SEPARATORS = re.compile(r"[\s._\-/()\[\],:;]+")
+
+
+def normalize(text):
+    """Kleinschreibung und einheitliche Trenner (Leerzeichen) für Vergleiche."""
+    return _SEPARATORS.sub(' ', text.lower()).strip()
+
+
+def _trie_pattern(words):
+    """Erzeugt aus einer Wortliste ein Regex-Muster in Form eines Präfixbaums.
+
+    Endet ein Wort an einem Knoten, an dem längere Wörter weitergehen, wird der
+    Rest als gieriger optionaler Teil angehängt - so wird der längste Treffer
+    an einer Position bevorzugt.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        terminal = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class InstrumentClassifier:
+    """Ordnet Texte (Part-Namen, Sound-IDs, Anzeigenamen) einer Kategorie zu."""
+
+    def __init__(self, keywords=None, abbreviations=None):
+        keywords = INSTRUMENT_KEYWORDS if keywords is None else keywords
+        abbreviations = INSTRUMENT_ABBREVIATIONS if abbreviations is None else abbreviations
+
+        self.categories = {}
+        for category, words in keywords.items():
+            for word in words:
+                self.categories.setdefault(normalize(word), category)
+        self.abbreviation_categories = {}
+        for category, words in abbreviations.items():
+            for word in words:
+                self.abbreviation_categories.setdefault(normalize(word), category)
+
+        # Schlüsselwörter zuerst: an derselben Position soll "cor anglais" nicht an der
+        # Abkürzung "cor" hängen bleiben (finditer würde den Text sonst verbrauchen)
+        parts = []
+        if self.categories:
+            parts.append('(?P<word>' + _trie_pattern(self.categories) + ')')
+        if self.abbreviation_categories:
+            parts.append(r'(?<![^\W\d_])(?P<abbr>' + _trie_pattern(self.abbreviation_categories) + r')(?![^\W\d_])')
+        self.pattern = re.compile('|'.join(parts)) if parts else None
+
+    def matches(self, text):
+        """Liefert alle Treffer als (Länge, Position, Kategorie)."""
+        if self.pattern is None:
+            return []
+        found = []
+        for match in self.pattern.finditer(normalize(text)):
+            table = self.categories if match.lastgroup == 'word' else self.abbreviation_categories
+            category = table.get(match.group(match.lastgroup))
+            if category:
+                found.append((match.end() - match.start(), match.start(), category))
+        return found
+
+    def classify(self, *texts):
+        """Kategorie des längsten Treffers in den Texten oder None."""
+        best = None
+        for text in texts:
+            if not text:
+                continue
+            for candidate in self.matches(text):
+                if best is None or candidate[:2] > best[:2]:
+                    best = candidate
+        return best[2] if best else None
+
+
+_default_classifier = None
+
+
+def default_classifier():
+    """Gemeinsamer, einmal kompilierter Klassifikator mit den Standard-Schlüsselwörtern."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = InstrumentClassifier()
+    return _default_classifier
+
+
+def classify(*texts):
+    return default_classifier().classify(*texts)
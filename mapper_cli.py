@@ -0,0 +1,251 @@
+"""Kommandozeilen-Modus: ordnet ganze Verzeichnisse von MusicXML-Dateien ohne GUI zu.
+
+Beispiel:
+    python mapper_cli.py scores/ --rules regeln.json --workers 8
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import diagnostics
+from mapper_core import load_mapping_rules, remap_file
+from mapping_profiles import MappingProfile
+
+# Dateiendungen, die beim Durchsuchen von Verzeichnissen berücksichtigt werden
+SCORE_EXTENSIONS = ('.xml', '.musicxml', '.mxl')
+
+
+def collect_files(inputs, recursive=False):
+    """Sammelt (Datei, Basisverzeichnis)-Paare aus Verzeichnissen, Dateien und Glob-Mustern."""
+    files = []
+    seen = set()
+
+    def add(path, base):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            files.append((path, base))
+
+    for entry in inputs:
+        if os.path.isdir(entry):
+            if recursive:
+                for dirpath, dirnames, filenames in os.walk(entry):
+                    dirnames.sort()
+                    for name in sorted(filenames):
+                        if name.lower().endswith(SCORE_EXTENSIONS):
+                            add(os.path.join(dirpath, name), entry)
+            else:
+                for name in sorted(os.listdir(entry)):
+                    path = os.path.join(entry, name)
+                    if name.lower().endswith(SCORE_EXTENSIONS) and os.path.isfile(path):
+                        add(path, entry)
+        elif os.path.isfile(entry):
+            add(entry, os.path.dirname(entry))
+        else:
+            for path in sorted(glob.glob(entry, recursive=recursive)):
+                if os.path.isfile(path):
+                    add(path, os.path.dirname(path))
+
+    return files
+
+
+def _output_path(path, base, output_dir):
+    if not output_dir:
+        return None
+    return os.path.join(output_dir, os.path.relpath(path, base))
+
+
+def _process(job):
+    """Arbeitet einen Auftrag im Worker-Prozess ab (muss auf Modulebene liegen)."""
+    path, output_path, rules, dry_run, profile, journal_path = job
+    journal = None
+    if journal_path:
+        from undo_journal import UndoJournal
+        journal = UndoJournal(journal_path)
+    result = remap_file(path, rules, output_path, dry_run, profile, journal)
+    if diagnostics.is_enabled():
+        # Messwerte aus dem Worker-Prozess an den Hauptprozess zurückgeben
+        result['diagnostics'] = diagnostics.recorder.drain()
+    return result
+
+
+def _collect_diagnostics(result):
+    events = result.pop('diagnostics', None)
+    if events:
+        diagnostics.recorder.merge(events)
+
+
+def run_batch(files, rules, workers=None, output_dir=None, dry_run=False, on_result=None,
+              profile=None, journal_path=None):
+    """Verarbeitet alle Dateien parallel und liefert die Ergebnisliste."""
+    jobs = [
+        (path, _output_path(path, base, output_dir), rules, dry_run, profile, journal_path)
+        for path, base in files
+    ]
+    workers = workers or os.cpu_count() or 1
+    results = []
+
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            result = _process(job)
+            _collect_diagnostics(result)
+            results.append(result)
+            if on_result:
+                on_result(result)
+        return results
+
+    # Erst hier importieren: der Prozess-Pool zieht multiprocessing nach sich
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Größere Pakete pro Worker halten den IPC-Aufwand bei vielen kleinen Dateien gering
+    chunksize = max(1, min(64, len(jobs) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_process, jobs, chunksize=chunksize):
+            _collect_diagnostics(result)
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def summarize(results, elapsed):
+    """Fasst die Ergebnisse eines Laufs zusammen."""
+    summary = {'files': len(results), 'changed': 0, 'unchanged': 0, 'ignored': 0, 'error': 0, 'changed_parts': 0,
+               'profiled_parts': 0}
+    for result in results:
+        summary[result['status']] += 1
+        summary['changed_parts'] += result['changed']
+        summary['profiled_parts'] += result['profiled']
+    summary['seconds'] = round(elapsed, 3)
+    summary['files_per_second'] = round(len(results) / elapsed, 1) if elapsed > 0 else None
+    return summary
+
+
+def _print_result(result):
+    if result['status'] == 'error':
+        print(f"FEHLER      {result['file']}: {result['error']}")
+    elif result['status'] == 'unchanged':
+        print(f"unverändert {result['file']} ({result['parts']} Parts)")
+    elif result['status'] == 'ignored':
+        print(f"übersprungen {result['file']} (keine Partitur: {result['reason']})")
+    else:
+        print(f"geändert    {result['file']} ({result['changed']} Sounds in {result['parts']} Parts)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Weist MusicXML-Dateien ohne GUI neue instrument-sound-Werte zu."
+    )
+    parser.add_argument('inputs', nargs='*', help="Verzeichnisse, Dateien oder Glob-Muster")
+    parser.add_argument('-r', '--rules', help="Mapping-Regeldatei (JSON)")
+    parser.add_argument('-p', '--profile', help="Mapping-Profil (JSON), hat Vorrang vor den Regeln")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Anzahl paralleler Prozesse (Standard: alle Kerne)")
+    parser.add_argument('-o', '--output-dir', help="Ergebnisse hierhin schreiben statt die Dateien zu überschreiben")
+    parser.add_argument('--recursive', action='store_true', help="Unterverzeichnisse durchsuchen")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="Nichts schreiben, nur berichten")
+    parser.add_argument('--json', action='store_true', help="Ergebnisse und Zusammenfassung als JSON ausgeben")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Nur die Zusammenfassung ausgeben")
+    parser.add_argument('-j', '--journal',
+                        help="Undo-Journal: ursprüngliche part-lists überschriebener Dateien hier protokollieren")
+    parser.add_argument('--undo', metavar='JOURNAL', help="Änderungen aus einem Undo-Journal rückgängig machen")
+    parser.add_argument('--diagnostics', metavar='DATEI',
+                        help="Zeiten und Zähler pro Arbeitsschritt als JSON speichern")
+    parser.add_argument('--trace', metavar='DATEI', help="Arbeitsschritte im Trace-Event-Format speichern")
+    parser.add_argument('--cprofile', metavar='DATEI', help="Lauf mit cProfile messen (pstats-Datei, mit -w 1 inklusive der Verarbeitung)")
+    parser.add_argument('--tracemalloc', type=int, default=0, metavar='N',
+                        help="Speicherspitze und die N größten Speicherverbraucher ausgeben")
+    return parser
+
+
+def undo(journal_path, quiet=False):
+    """Rollt einen Lauf anhand seines Journals zurück."""
+    from undo_journal import rollback
+
+    def report(result):
+        if result['status'] == 'error':
+            print(f"FEHLER          {result['file']}: {result['error']}")
+        elif not quiet:
+            label = "wiederhergestellt" if result['status'] == 'restored' else "übersprungen"
+            print(f"{label:<17} {result['file']}")
+
+    try:
+        results = rollback(journal_path, report)
+    except OSError as e:
+        print(f"Fehler beim Lesen des Journals: {e}", file=sys.stderr)
+        return 2
+    restored = sum(1 for result in results if result['status'] == 'restored')
+    errors = sum(1 for result in results if result['status'] == 'error')
+    print(f"{restored} Dateien wiederhergestellt, {len(results) - restored - errors} übersprungen, "
+          f"{errors} Fehler")
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.diagnostics or args.trace:
+        diagnostics.enable()
+
+    with diagnostics.profiled(args.cprofile, args.tracemalloc, sys.stderr):
+        status = run(parser, args)
+
+    if args.diagnostics:
+        diagnostics.recorder.export_json(args.diagnostics)
+    if args.trace:
+        diagnostics.recorder.export_trace(args.trace)
+    return status
+
+
+def run(parser, args):
+    if args.undo:
+        return undo(args.undo, args.quiet)
+    if not args.inputs:
+        parser.error("Bitte Dateien oder Verzeichnisse angeben.")
+    if not args.rules and not args.profile:
+        print("Bitte --rules und/oder --profile angeben.", file=sys.stderr)
+        return 2
+
+    rules = None
+    profile = None
+    try:
+        if args.rules:
+            rules = load_mapping_rules(args.rules)
+        if args.profile:
+            if not os.path.isfile(args.profile):
+                raise ValueError(f"{args.profile} nicht gefunden")
+            profile = MappingProfile.load(args.profile)
+    except (OSError, ValueError) as e:
+        print(f"Fehler beim Laden von Regeln oder Profil: {e}", file=sys.stderr)
+        return 2
+
+    files = collect_files(args.inputs, args.recursive)
+    if not files:
+        print("Keine MusicXML-Dateien gefunden.", file=sys.stderr)
+        return 1
+
+    on_result = None if (args.quiet or args.json) else _print_result
+    start = time.perf_counter()
+    journal_path = os.path.abspath(args.journal) if args.journal else None
+    results = run_batch(files, rules, args.workers, args.output_dir, args.dry_run, on_result, profile,
+                        journal_path)
+    summary = summarize(results, time.perf_counter() - start)
+
+    if args.json:
+        json.dump({'results': results, 'summary': summary}, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print(f"{summary['files']} Dateien in {summary['seconds']} s "
+              f"({summary['files_per_second']} Dateien/s): "
+              f"{summary['changed']} geändert, {summary['unchanged']} unverändert, "
+              f"{summary['ignored']} keine Partitur, {summary['error']} Fehler"
+              + (f", {summary['profiled_parts']} Instrumente aus dem Profil" if profile is not None else ""))
+
+    return 1 if summary['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
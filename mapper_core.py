@@ -0,0 +1,904 @@
+import xml.etree.ElementTree as ET
+import copy
+import json
+import os
+import re
+import zipfile
+from xml.parsers import expat
+from xml.sax.saxutils import escape
+
+from atomic_io import atomic_write
+from diagnostics import phase
+from instrument_classifier import default_classifier
+from mapping_profiles import fingerprint
+from mxl_archive import is_mxl, find_rootfile, rewrite_member
+
+# Größe der Blöcke beim inkrementellen Lesen des Dateikopfs
+READ_CHUNK_SIZE = 64 * 1024
+# So viele Bytes liest prescan() höchstens, um das Root-Element zu finden
+PRESCAN_SIZE = 4 * 1024
+
+SCORE_ROOTS = ('score-partwise', 'score-timewise')
+
+_PART_LIST_START = re.compile(rb'<((?:[A-Za-z_][\w.-]*:)?)part-list[\s/>]')
+_PART_LIST_END = re.compile(rb'</(?:[A-Za-z_][\w.-]*:)?part-list\s*>')
+_XML_ENCODING = re.compile(rb'<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+_ELEMENT_START = re.compile(rb'<(?:([A-Za-z_][\w.-]*):)?([A-Za-z_][\w.-]*)([^>]*)')
+_TAG = re.compile(rb'<[^>"\']*(?:(?:"[^"]*"|\'[^\']*\')[^>"\']*)*>')
+_DOCTYPE = re.compile(rb'<!DOCTYPE\s+([^\s>\[]+)(?:\s+PUBLIC\s+["\']([^"\']*)["\'])?')
+
+# Kategorien, die in der Oberfläche zur Auswahl stehen
+CATEGORIES = ["Strings", "Woodwinds", "Brass", "Percussion", "Keys"]
+
+
+def namespace_prefix(tag):
+    """Liefert den Namespace-Präfix ('{uri}') eines Tags oder einen leeren String."""
+    match = re.match(r'{(.+)}', tag)
+    if match:
+        return '{' + match.group(1) + '}'
+    return ''
+
+
+def local_name(tag):
+    """Entfernt den Namespace-Anteil eines Tags."""
+    return tag.rsplit('}', 1)[-1]
+
+
+class ScoreHeader:
+    """Kopfdaten einer MusicXML-Datei: Root-Tag, Namespace und <part-list>."""
+
+    def __init__(self, file_path, root_tag, part_list, part_list_span=None, encoding='utf-8',
+                 archive_member=None, part_list_bytes=None):
+        self.file_path = file_path
+        # Name der Partitur innerhalb eines .mxl-Archivs, sonst None
+        self.archive_member = archive_member
+        self.root_tag = root_tag
+        self.ns_prefix = namespace_prefix(root_tag) if root_tag else ''
+        self.part_list = part_list
+        with phase('analyze.index') as p:
+            self.index = PartIndex(part_list, self.ns_prefix) if part_list is not None else None
+            self.parts = extract_parts(self.index) if self.index is not None else []
+            p.add('parts', len(self.parts))
+        # Byte-Bereich (start, ende) der <part-list> in der (entpackten) Partitur, falls bekannt,
+        # und die Original-Bytes dieses Bereichs (für das Undo-Journal)
+        self.part_list_span = part_list_span
+        self.part_list_bytes = part_list_bytes
+        self.encoding = encoding
+        self.stamp = file_stamp(file_path)
+        # True, solange die <part-list> im Speicher vom Stand der Datei abweicht
+        self.modified = False
+
+    def is_current(self):
+        """Prüft, ob Datei und <part-list> im Speicher übereinstimmen (erneute Analyse unnötig)."""
+        return (not self.modified and self.stamp is not None
+                and self.stamp == file_stamp(self.file_path))
+
+
+def file_stamp(file_path):
+    """Änderungszeit und Größe einer Datei oder None, falls sie nicht lesbar ist."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class PartIndex:
+    """Verweise auf die Elemente der <part-list>, in einem Durchlauf aufgebaut.
+
+    Schlüssel sind die Part-ID bzw. (Part-ID, Instrument-ID), damit beim
+    Speichern nur die geänderten Parts angefasst werden müssen.
+    """
+
+    def __init__(self, part_list, ns_prefix=''):
+        self.ns_prefix = ns_prefix
+        self.score_parts = {}
+        # part_id -> Liste der <score-instrument>-Elemente in Dateireihenfolge
+        self.score_instruments = {}
+        # (part_id, instrument_id) -> Element
+        self.instruments = {}
+        self.instrument_sounds = {}
+        self.midi_instruments = {}
+
+        score_part_tag = ns_prefix + 'score-part'
+        score_instrument_tag = ns_prefix + 'score-instrument'
+        midi_instrument_tag = ns_prefix + 'midi-instrument'
+        sound_tag = ns_prefix + 'instrument-sound'
+
+        for part in part_list.iter(score_part_tag):
+            part_id = part.get('id')
+            self.score_parts.setdefault(part_id, part)
+            instruments = self.score_instruments.setdefault(part_id, [])
+            for child in part:
+                if child.tag == score_instrument_tag:
+                    instruments.append(child)
+                    self.instruments.setdefault((part_id, child.get('id')), child)
+                    sound_elem = child.find(sound_tag)
+                    if sound_elem is not None:
+                        self.instrument_sounds[(part_id, child.get('id'))] = sound_elem
+                elif child.tag == midi_instrument_tag:
+                    self.midi_instruments.setdefault((part_id, child.get('id')), child)
+
+    def instrument_sound(self, part_id, instrument_id=None):
+        """<instrument-sound> eines Instruments (ohne ID: das erste vorhandene des Parts)."""
+        if instrument_id is not None:
+            return self.instrument_sounds.get((part_id, instrument_id))
+        for instrument in self.score_instruments.get(part_id, ()):
+            sound_elem = self.instrument_sounds.get((part_id, instrument.get('id')))
+            if sound_elem is not None:
+                return sound_elem
+        return None
+
+    def add_instrument_sound(self, part_id, score_instrument, sound):
+        """Legt <instrument-sound> in score_instrument an und nimmt es in den Index auf."""
+        sound_elem = _insert_instrument_sound(score_instrument, self.ns_prefix, sound)
+        self.instrument_sounds[(part_id, score_instrument.get('id'))] = sound_elem
+        return sound_elem
+
+
+def extract_parts(index):
+    """Liest die Metadaten aller <score-part>-Elemente aus dem PartIndex.
+
+    'instruments' enthält pro <score-instrument> ID, Name, instrument-sound
+    und die Note (midi-unpitched) des zugehörigen <midi-instrument>, an der sich
+    Set-Instrumente mit gleichem oder fehlendem Namen unterscheiden lassen.
+    """
+    ns_prefix = index.ns_prefix
+    parts = []
+    for idx, (part_id, part) in enumerate(index.score_parts.items()):
+        # Finde den Instrumentennamen
+        part_name_elem = part.find(ns_prefix + 'part-name')
+        if part_name_elem is not None and part_name_elem.text:
+            part_name = part_name_elem.text.strip()
+        else:
+            part_name = f"Instrument {idx+1}"
+
+        # Finde instrument-sound wenn vorhanden
+        instrument_sound = None
+        sound_elem = index.instrument_sound(part_id)
+        if sound_elem is not None and sound_elem.text:
+            instrument_sound = sound_elem.text.strip()
+
+        instruments = [_instrument_info(index, part_id, elem)
+                       for elem in index.score_instruments[part_id]]
+
+        parts.append({
+            'part_id': part_id,
+            'part_name': part_name,
+            'instrument_sound': instrument_sound,
+            'score_instruments': [instrument['instrument_id'] for instrument in instruments],
+            'instruments': instruments
+        })
+    return parts
+
+
+def _instrument_info(index, part_id, score_instrument):
+    ns_prefix = index.ns_prefix
+    instrument_id = score_instrument.get('id')
+    sound_elem = index.instrument_sound(part_id, instrument_id)
+    info = {
+        'instrument_id': instrument_id,
+        'instrument_name': _child_text(score_instrument, ns_prefix + 'instrument-name'),
+        'instrument_sound': sound_elem.text.strip() if sound_elem is not None and sound_elem.text else None,
+        'midi_unpitched': None
+    }
+    midi_elem = index.midi_instruments.get((part_id, instrument_id))
+    if midi_elem is not None:
+        info['midi_unpitched'] = _child_text(midi_elem, ns_prefix + 'midi-unpitched')
+    return info
+
+
+def _child_text(elem, tag):
+    child = elem.find(tag)
+    if child is not None and child.text:
+        return child.text.strip()
+    return None
+
+
+def guess_category(part_name, classifier=None):
+    """Versucht, die Kategorie anhand des Instrumentennamens zu erraten."""
+    return (classifier or default_classifier()).classify(part_name)
+
+
+def read_score_header(file_path):
+    """Liest inkrementell nur den Kopf bis zum Ende der <part-list>.
+
+    Das Parsen bricht ab, bevor der erste <part> mit den Noten gelesen wird,
+    sodass auch sehr große Partituren nur wenige Kilobyte Speicher brauchen.
+    Nebenbei wird die Byte-Position der <part-list> ermittelt, damit
+    write_score() den Rest der Datei unverändert kopieren kann.
+    Komprimierte .mxl-Dateien werden direkt aus dem Archiv gestreamt.
+    """
+    with phase('analyze.parse_header') as p:
+        if is_mxl(file_path):
+            with zipfile.ZipFile(file_path) as zf:
+                member = find_rootfile(zf)
+                with zf.open(member) as f:
+                    root_tag, part_list, head = _read_header_stream(f)
+        else:
+            member = None
+            with open(file_path, 'rb') as f:
+                root_tag, part_list, head = _read_header_stream(f)
+        p.add('bytes', len(head))
+
+    with phase('analyze.detect_layout'):
+        encoding = _detect_encoding(head)
+        span = _locate_part_list(head, part_list, encoding)
+        part_list_bytes = bytes(head[span[0]:span[1]]) if span is not None else None
+    return ScoreHeader(file_path, root_tag, part_list, span, encoding, member, part_list_bytes)
+
+
+def _read_header_stream(f):
+    """Parst einen Stream bis zum Ende der <part-list> und liefert die gelesenen Bytes mit."""
+    root_tag = None
+    part_list = None
+    head = bytearray()
+    parser = ET.XMLPullParser(events=('start', 'end'))
+
+    while part_list is None:
+        chunk = f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        head += chunk
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root_tag is None:
+                    root_tag = elem.tag
+                elif local_name(elem.tag) in ('part', 'measure'):
+                    # Kein <part-list> vor dem ersten Part (bzw. Takt bei score-timewise) vorhanden
+                    raise ValueError("Keine <part-list> in der Datei gefunden.")
+            elif local_name(elem.tag) == 'part-list':
+                part_list = elem
+                break
+
+    if root_tag is None:
+        raise ValueError("Keine gültige MusicXML-Datei.")
+    if part_list is None:
+        raise ValueError("Keine <part-list> in der Datei gefunden.")
+
+    return root_tag, part_list, head
+
+
+def _detect_encoding(head):
+    """Ermittelt das Encoding aus der XML-Deklaration (Standard: UTF-8)."""
+    match = _XML_ENCODING.match(head.lstrip(b'\xef\xbb\xbf'))
+    if match:
+        return match.group(1).decode('ascii')
+    return 'utf-8'
+
+
+def _locate_part_list(head, part_list, encoding='utf-8'):
+    """Sucht den Byte-Bereich der <part-list> im gelesenen Dateikopf.
+
+    Gesucht wird erst nach dem Start-Tag des Root-Elements; Kommentare,
+    Verarbeitungsanweisungen, CDATA und DOCTYPE werden übersprungen. Der
+    gefundene Bereich muss außerdem genau die geparste part_list ergeben.
+    Gibt None zurück, wenn der Bereich nicht eindeutig bestimmt werden kann
+    (z.B. UTF-16-Dateien oder Namespace-Präfixe), dann wird beim Speichern
+    die komplette Datei neu geschrieben.
+    """
+    root_seen = False
+    start = None
+    pos = 0
+    while True:
+        tag = head.find(b'<', pos)
+        if tag < 0:
+            return None
+        end = _markup_end(head, tag)
+        if end is not None:
+            if end < 0:
+                return None
+            pos = end
+            continue
+
+        if not root_seen:
+            root_seen = True
+        elif start is None:
+            match = _PART_LIST_START.match(head, tag)
+            if match:
+                if match.group(1):
+                    return None
+                start = tag
+        else:
+            match = _PART_LIST_END.match(head, tag)
+            if match:
+                break
+        pos = tag + 1
+
+    span = (start, match.end())
+    if not _same_part_list(bytes(head[span[0]:span[1]]), part_list, encoding):
+        return None
+    return span
+
+
+def _markup_end(head, pos):
+    """Ende des Kommentars, der Verarbeitungsanweisung, des CDATA-Abschnitts oder
+    DOCTYPE, der bei pos beginnt; None bei einem Element-Tag, -1 ohne Ende im Puffer."""
+    for opening, closing in ((b'<!--', b'-->'), (b'<?', b'?>'), (b'<![CDATA[', b']]>')):
+        if head.startswith(opening, pos):
+            end = head.find(closing, pos + len(opening))
+            return end + len(closing) if end >= 0 else -1
+    if head.startswith(b'<!', pos):
+        # DOCTYPE, ggf. mit internem Subset in [...]
+        end = head.find(b'>', pos)
+        bracket = head.find(b'[', pos)
+        if 0 <= bracket < end:
+            close = head.find(b']', bracket)
+            end = head.find(b'>', close) if close >= 0 else -1
+        return end + 1 if end >= 0 else -1
+    return None
+
+
+def _same_part_list(data, part_list, encoding):
+    """Prüft, ob die Bytes eine <part-list> mit denselben Elementen wie part_list enthalten."""
+    declaration = f'<?xml version="1.0" encoding="{encoding}"?>'.encode('ascii')
+    try:
+        elem = ET.fromstring(declaration + data)
+    except (ET.ParseError, LookupError, ValueError):
+        return False
+    return _element_signature(elem) == _element_signature(part_list)
+
+
+def _element_signature(elem):
+    return [(local_name(child.tag), sorted(child.attrib.items()), (child.text or '').strip())
+            for child in elem.iter()]
+
+
+def prescan(file_path):
+    """Prüft anhand der ersten Bytes, ob die Datei überhaupt eine MusicXML-Partitur ist.
+
+    Liefert ein Dict mit 'root' (lokaler Name des Root-Elements), 'namespace',
+    'doctype' (Public-ID oder Name aus <!DOCTYPE>) und 'score': True für
+    score-partwise/score-timewise, False für andere Dokumente und None, wenn
+    das Root-Element in den ersten PRESCAN_SIZE Bytes nicht zu finden war
+    (dann entscheidet erst read_score_header()).
+    """
+    with phase('analyze.prescan') as p:
+        if is_mxl(file_path):
+            with zipfile.ZipFile(file_path) as zf:
+                with zf.open(find_rootfile(zf)) as f:
+                    head = f.read(PRESCAN_SIZE)
+        else:
+            with open(file_path, 'rb') as f:
+                head = f.read(PRESCAN_SIZE)
+        p.add('bytes', len(head))
+        return _scan_prolog(_prescan_bytes(head))
+
+
+def _prescan_bytes(head):
+    """Wandelt UTF-16-Anfänge in UTF-8 um, damit die Suchmuster greifen."""
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        encoding = 'utf-16'
+    elif head.startswith(b'<\x00'):
+        encoding = 'utf-16-le'
+    elif head.startswith(b'\x00<'):
+        encoding = 'utf-16-be'
+    else:
+        return head.lstrip(b'\xef\xbb\xbf')
+    # Ein am Blockende abgeschnittenes Zeichen wird ignoriert
+    return head[:len(head) & ~1].decode(encoding, errors='ignore').encode('utf-8')
+
+
+def _scan_prolog(head):
+    """Überspringt XML-Deklaration, Kommentare, Verarbeitungsanweisungen und DOCTYPE."""
+    info = {'root': None, 'namespace': None, 'doctype': None, 'score': None}
+    pos = 0
+    while True:
+        start = head.find(b'<', pos)
+        if start < 0:
+            if head[pos:].strip():
+                # Text vor dem ersten Tag: kein XML
+                info['score'] = False
+            return info
+        if head[pos:start].strip():
+            info['score'] = False
+            return info
+
+        match = _DOCTYPE.match(head, start)
+        if match:
+            info['doctype'] = (match.group(2) or match.group(1)).decode('utf-8', 'replace')
+        end = _markup_end(head, start)
+        if end is None:
+            match = _ELEMENT_START.match(head, start)
+            if match is None:
+                info['score'] = False
+                return info
+            prefix, name, attributes = match.groups()
+            xmlns = rb'xmlns' + (b':' + prefix if prefix else b'')
+            ns_match = re.search(xmlns + rb'\s*=\s*["\']([^"\']*)["\']', attributes)
+            info['root'] = name.decode('utf-8')
+            info['namespace'] = ns_match.group(1).decode('utf-8') if ns_match else None
+            info['score'] = info['root'] in SCORE_ROOTS
+            return info
+
+        if end < 0:
+            # Prolog länger als PRESCAN_SIZE: ohne Urteil weiter zum normalen Lesen
+            return info
+        pos = end
+
+
+def apply_sound_mappings(header, mappings):
+    """Setzt die instrument-sound-Werte der <part-list> laut Mapping.
+
+    Schlüssel sind entweder (part_id, instrument_id) für ein einzelnes
+    <score-instrument> oder eine part_id; dann gilt der Sound für das erste
+    Instrument des Parts (bzw. das erste mit instrument-sound).
+    Die Elemente werden über header.index gefunden, der Aufwand hängt also
+    nur von der Anzahl der Mappings ab, nicht von der Größe der <part-list>.
+    """
+    with phase('save.lookup', mappings=len(mappings)) as p:
+        changed = _apply_sound_mappings(header.index, mappings)
+        p.add('changed', changed)
+
+    if changed:
+        header.modified = True
+        # parts spiegelt sonst noch die alten Sounds, auch wenn der Header nach
+        # dem Speichern wiederverwendet wird (is_current())
+        header.parts = extract_parts(header.index)
+    return changed
+
+
+def _apply_sound_mappings(index, mappings):
+    changed = 0
+    for key, new_sound in mappings.items():
+        if not new_sound:
+            continue
+
+        if isinstance(key, tuple):
+            part_id, instrument_id = key
+            score_instrument = index.instruments.get(key)
+            if score_instrument is None:
+                continue
+            sound_elem = index.instrument_sound(part_id, instrument_id)
+        else:
+            part_id = key
+            if part_id not in index.score_parts:
+                continue
+            sound_elem = index.instrument_sound(part_id)
+            instruments = index.score_instruments[part_id]
+            score_instrument = instruments[0] if instruments else None
+
+        if sound_elem is not None:
+            # Aktualisiere existierendes Element
+            if sound_elem.text != new_sound:
+                sound_elem.text = new_sound
+                changed += 1
+        elif score_instrument is not None:
+            # Erstelle neues Element im score-instrument
+            index.add_instrument_sound(part_id, score_instrument, new_sound)
+            changed += 1
+    return changed
+
+
+def _insert_instrument_sound(score_instrument, ns_prefix, sound):
+    """Fügt <instrument-sound> an der vom Schema vorgesehenen Position ein."""
+    sound_elem = ET.Element(ns_prefix + 'instrument-sound')
+    sound_elem.text = sound
+
+    # instrument-sound folgt auf instrument-name und instrument-abbreviation
+    position = 0
+    for idx, child in enumerate(score_instrument):
+        if local_name(child.tag) in ('instrument-name', 'instrument-abbreviation'):
+            position = idx + 1
+
+    # Einrückung der Nachbarelemente übernehmen
+    if position:
+        previous = score_instrument[position - 1]
+        sound_elem.tail = previous.tail
+        if position == len(score_instrument):
+            previous.tail = score_instrument.text
+    score_instrument.insert(position, sound_elem)
+    return sound_elem
+
+
+def write_score(header, target_path, journal=None):
+    """Schreibt die Partitur mit der (geänderten) <part-list> nach target_path.
+
+    Ist der Byte-Bereich der <part-list> bekannt, werden darin nur die
+    geänderten instrument-sound-Werte ersetzt (siehe patch_part_list()) und
+    die übrigen Bytes unverändert kopiert. Andernfalls wird die Datei komplett
+    geparst und neu geschrieben. Bei .mxl-Archiven wird nur die Partitur neu komprimiert.
+    Mit journal (UndoJournal) wird das Überschreiben der Quelldatei vor dem
+    Ersetzen protokolliert, sodass es sich rückgängig machen lässt.
+    Wurde die Quelldatei seit dem Einlesen verändert, wird ein ValueError
+    ausgelöst, statt veraltete Byte-Positionen zu verwenden.
+    """
+    in_place = os.path.abspath(target_path) == os.path.abspath(header.file_path)
+    span = header.part_list_span
+    part_list_bytes = None
+    if span is not None:
+        with phase('save.serialize'):
+            part_list_bytes = patch_part_list(header)
+        if part_list_bytes is None:
+            span = None
+
+    def produce(tmp_path):
+        _check_unchanged(header)
+        if header.archive_member:
+            _rewrite_archive(header.file_path, header.archive_member, tmp_path, span, part_list_bytes, header)
+        elif span is not None:
+            _splice_bytes(header.file_path, tmp_path, span, part_list_bytes)
+        else:
+            _rewrite_full_tree(header, tmp_path)
+
+    def before_replace(tmp_path):
+        if span is not None and header.part_list_bytes is not None:
+            journal.record_span(header.file_path, header.archive_member, span[0],
+                                header.part_list_bytes, part_list_bytes)
+        else:
+            journal.record_file(header.file_path, tmp_path)
+
+    with phase('save.write', full_rewrite=int(span is None)):
+        atomic_write(target_path, produce, before_replace if journal is not None and in_place else None)
+
+    if in_place:
+        # Die Originaldatei wurde ersetzt, der Byte-Bereich hat sich verschoben
+        header.part_list_span = (span[0], span[0] + len(part_list_bytes)) if span is not None else None
+        header.part_list_bytes = part_list_bytes
+        header.stamp = file_stamp(header.file_path)
+        header.modified = False
+
+
+def _check_unchanged(header):
+    """Prüft, ob die Quelldatei noch dem eingelesenen Kopf entspricht."""
+    unchanged = header.stamp is not None and header.stamp == file_stamp(header.file_path)
+    span = header.part_list_span
+    if unchanged and span is not None and header.part_list_bytes is not None:
+        # Auch bei gleicher Zeit und Größe: die <part-list> muss noch an derselben Stelle stehen
+        current = read_span(header.file_path, header.archive_member, span[0], span[1] - span[0])
+        unchanged = current == header.part_list_bytes
+    if not unchanged:
+        raise ValueError(f"{header.file_path} wurde seit dem Einlesen verändert, "
+                         "bitte erneut analysieren.")
+
+
+def replace_span(file_path, archive_member, start, old_length, data):
+    """Ersetzt old_length Bytes ab start in der (entpackten) Partitur atomar durch data."""
+    span = (start, start + old_length)
+
+    def produce(tmp_path):
+        if archive_member:
+            _rewrite_archive(file_path, archive_member, tmp_path, span, data)
+        else:
+            _splice_bytes(file_path, tmp_path, span, data)
+
+    atomic_write(file_path, produce)
+
+
+def read_span(file_path, archive_member, start, length):
+    """Liest length Bytes ab start aus der (entpackten) Partitur."""
+    if archive_member:
+        with zipfile.ZipFile(file_path) as zf, zf.open(archive_member) as f:
+            _stream_copy(f, None, start)
+            return f.read(length)
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        return f.read(length)
+
+
+def patch_part_list(header):
+    """Überträgt die instrument-sound-Werte aus dem Speicher in die Original-Bytes der <part-list>.
+
+    Nur die Texte geänderter <instrument-sound>-Elemente werden ersetzt, fehlende
+    mit der Einrückung (und den Zeilenenden) des Nachbarelements eingefügt;
+    Kommentare und Formatierung bleiben erhalten. Gibt None zurück, wenn die
+    Bytes nicht zum Baum im Speicher passen (dann wird die Datei neu geschrieben).
+    """
+    original = header.part_list_bytes
+    if original is None:
+        return None
+    records = _scan_score_instruments(original, header.encoding)
+    elements = list(header.part_list.iter(header.ns_prefix + 'score-instrument'))
+    if records is None or len(records) != len(elements):
+        return None
+
+    edits = []
+    for record, elem in zip(records, elements):
+        sound_elem = elem.find(header.ns_prefix + 'instrument-sound')
+        if sound_elem is None:
+            if record['sound'] is not None:
+                return None
+            continue
+        text = escape(sound_elem.text or '').encode(header.encoding, errors='xmlcharrefreplace')
+        element = b'<instrument-sound>' + text + b'</instrument-sound>'
+        if record['sound'] is None:
+            position, indent = record['insert']
+            edits.append((position, position, indent + element))
+        elif (sound_elem.text or '') != record['text']:
+            start, end, empty = record['sound']
+            edits.append((start, end, element if empty else text))
+
+    data = bytearray(original)
+    for start, end, replacement in sorted(edits, reverse=True):
+        data[start:end] = replacement
+    data = bytes(data)
+    if edits and not _same_part_list(data, header.part_list, header.encoding):
+        return None
+    return data
+
+
+def _scan_score_instruments(data, encoding):
+    """Byte-Positionen in allen <score-instrument>-Elementen der <part-list>-Bytes.
+
+    Pro Element (in Dateireihenfolge): 'sound' = (start, ende, leer) des Inhalts
+    von <instrument-sound> bzw. des leeren Elements, 'text' = dessen Text und
+    'insert' = (Position, Einrückung) für ein neues <instrument-sound>.
+    """
+    declaration = f'<?xml version="1.0" encoding="{encoding}"?>'.encode('ascii')
+    offset = len(declaration)
+    parser = expat.ParserCreate()
+    records = []
+    stack = []
+    texts = []
+
+    def start(name, attributes):
+        position = parser.CurrentByteIndex - offset
+        tag = _TAG.match(data, position)
+        tag_end = tag.end() if tag else position
+        parent = stack[-1] if stack else None
+        stack.append((name, position, tag_end))
+        if name == 'score-instrument':
+            records.append({'sound': None, 'text': '', 'insert': (tag_end, b''), 'children': 0})
+        elif parent is not None and parent[0] == 'score-instrument':
+            record = records[-1]
+            if record['children'] == 0:
+                # Ohne instrument-name direkt nach dem Start-Tag einfügen
+                record['insert'] = (parent[2], _indent_before(data, position))
+            record['children'] += 1
+            if name == 'instrument-sound' and record['sound'] is None:
+                empty = data[tag_end - 2:tag_end] == b'/>'
+                record['sound'] = [position if empty else tag_end, None, empty]
+                texts.clear()
+
+    def end(name):
+        position = parser.CurrentByteIndex - offset
+        name, start_position, tag_end = stack.pop()
+        if data.startswith(b'</', position):
+            tag = _TAG.match(data, position)
+            element_end = tag.end() if tag else position
+        else:
+            # Leeres Element: expat meldet das Ende direkt hinter "/>"
+            element_end = position
+        if not stack or stack[-1][0] != 'score-instrument':
+            return
+        record = records[-1]
+        if name == 'instrument-sound' and record['sound'] is not None and record['sound'][1] is None:
+            empty = record['sound'][2]
+            record['sound'][1] = element_end if empty else position
+            record['text'] = ''.join(texts)
+        elif name in ('instrument-name', 'instrument-abbreviation') and record['sound'] is None:
+            record['insert'] = (element_end, _indent_before(data, start_position))
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = texts.append
+    try:
+        parser.Parse(declaration + data, True)
+    except expat.ExpatError:
+        return None
+    return records
+
+
+def _indent_before(data, position):
+    """Leerraum (Zeilenumbruch und Einrückung) unmittelbar vor position."""
+    start = position
+    while start > 0 and data[start - 1:start] in (b' ', b'\t', b'\r', b'\n'):
+        start -= 1
+    return data[start:position]
+
+
+def _splice_bytes(src_path, target_path, span, data):
+    start, end = span
+    size = os.path.getsize(src_path)
+
+    with open(src_path, 'rb', buffering=0) as src, \
+            open(target_path, 'wb', buffering=0) as dst:
+        copy_range(src, dst, 0, start)
+        dst.write(data)
+        copy_range(src, dst, end, size - end)
+
+
+def copy_range(src, dst, offset, count):
+    """Kopiert count Bytes ab offset von src nach dst (ungepufferte Dateien).
+
+    Unter Linux erledigt os.copy_file_range das im Kernel, sonst wird
+    blockweise kopiert.
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while count > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), count, offset)
+                if copied == 0:
+                    break
+                offset += copied
+                count -= copied
+        except OSError:
+            # z.B. unterschiedliche Dateisysteme oder nicht unterstützt
+            pass
+
+    src.seek(offset)
+    while count > 0:
+        chunk = src.read(min(count, 1024 * 1024))
+        if not chunk:
+            break
+        dst.write(chunk)
+        count -= len(chunk)
+
+
+def _rewrite_full_tree(header, target, source=None):
+    tree = ET.parse(source if source is not None else header.file_path)
+    root = tree.getroot()
+    for idx, child in enumerate(root):
+        if local_name(child.tag) == 'part-list':
+            root[idx] = header.part_list
+            break
+    tree.write(target, encoding='UTF-8', xml_declaration=True)
+
+
+def _rewrite_archive(src_path, member, target_path, span, data, header=None):
+    """Schreibt ein .mxl-Archiv neu, in dem nur die Partitur ersetzt wird.
+
+    Ohne span wird die Partitur mit der <part-list> aus header komplett neu geschrieben.
+    """
+
+    def produce(source, write):
+        if span is None:
+            _rewrite_full_tree(header, _StreamWriter(write), source)
+            return
+
+        start, end = span
+        _stream_copy(source, write, start)
+        write(data)
+        _stream_copy(source, None, end - start)
+        _stream_copy(source, write, None)
+
+    rewrite_member(src_path, target_path, member, produce)
+
+
+def _stream_copy(source, write, count):
+    """Liest count Bytes (None = bis zum Ende) aus source und gibt sie an write weiter."""
+    while count is None or count > 0:
+        size = READ_CHUNK_SIZE * 16 if count is None else min(count, READ_CHUNK_SIZE * 16)
+        chunk = source.read(size)
+        if not chunk:
+            break
+        if write is not None:
+            write(chunk)
+        if count is not None:
+            count -= len(chunk)
+
+
+class _StreamWriter:
+    """Minimales Dateiobjekt, über das ElementTree direkt in eine write-Funktion schreibt."""
+
+    def __init__(self, write):
+        self.write = write
+
+
+def load_mapping_rules(rules_path):
+    """Lädt eine Mapping-Regeldatei (JSON).
+
+    Erwartetes Format, alle Abschnitte sind optional:
+
+        {
+            "parts": {"Violin I": "strings.violin.berlin"},
+            "keywords": {"flute": "woodwinds.flute.berlin"},
+            "categories": {"Brass": "brass.trumpet.berlin"}
+        }
+
+    "parts" vergleicht den kompletten Part-Namen, "keywords" sucht Teilstrings
+    im Part-Namen, "categories" greift auf die erratene Kategorie zurück.
+    """
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError("Die Regeldatei muss ein JSON-Objekt enthalten.")
+
+    for section in ('parts', 'keywords', 'categories'):
+        entries = data.get(section, {})
+        if not isinstance(entries, dict):
+            raise ValueError(f"Der Abschnitt \"{section}\" muss ein JSON-Objekt sein.")
+        for name, sound in entries.items():
+            if not isinstance(sound, str):
+                raise ValueError(f"Ungültiger Sound für \"{name}\" in \"{section}\": {sound!r}")
+
+    return {
+        'parts': {name.strip().lower(): sound for name, sound in data.get('parts', {}).items()},
+        'keywords': {key.lower(): sound for key, sound in data.get('keywords', {}).items()},
+        'categories': dict(data.get('categories', {}))
+    }
+
+
+def resolve_sound(part, rules, instrument=None):
+    """Ermittelt den Ziel-Sound für einen Part (oder eines seiner Instrumente) laut Regeln oder None.
+
+    Bei einem Instrument wird zuerst dessen Name geprüft, dann der Part-Name.
+    """
+    names = [part['part_name']]
+    if instrument is not None and instrument['instrument_name']:
+        names.insert(0, instrument['instrument_name'])
+
+    for name in names:
+        sound = rules['parts'].get(name.lower())
+        if sound:
+            return sound
+
+    for name in names:
+        lowered = name.lower()
+        for key, sound in rules['keywords'].items():
+            if key in lowered:
+                return sound
+
+    for name in names:
+        category = guess_category(name)
+        if category:
+            return rules['categories'].get(category)
+    return None
+
+
+def sound_mapping_keys(part):
+    """Mapping-Schlüssel eines Parts: die part_id oder bei mehreren Instrumenten je Instrument
+    (part_id, instrument_id) zusammen mit dem Instrument-Dict."""
+    if len(part['instruments']) <= 1:
+        return [(part['part_id'], None)]
+    return [((part['part_id'], instrument['instrument_id']), instrument)
+            for instrument in part['instruments']]
+
+
+def remap_file(file_path, rules, output_path=None, dry_run=False, profile=None, journal=None):
+    """Wendet Profil und Regeln auf eine Datei an und liefert ein Ergebnis-Dict.
+
+    Ein Treffer im Mapping-Profil hat Vorrang vor den Regeln; rules oder
+    profile dürfen None sein. 'profiled' zählt die Instrumente aus dem Profil.
+    journal ist ein optionales UndoJournal für Überschreibungen an Ort und Stelle.
+
+    Dateien, die laut prescan() keine Partitur sind, werden ohne weiteres Lesen
+    mit dem Status 'ignored' übersprungen ('reason' nennt das Root-Element).
+
+    Ohne output_path wird die Datei an Ort und Stelle überschrieben, aber
+    nur, wenn sich tatsächlich ein instrument-sound geändert hat. Mit
+    output_path wird immer geschrieben, damit das Zielverzeichnis vollständig ist.
+    """
+    result = {'file': file_path, 'parts': 0, 'changed': 0, 'profiled': 0, 'status': 'changed',
+              'reason': None, 'error': None}
+    with phase('batch.remap_file'):
+        _remap_file(result, file_path, rules, output_path, dry_run, profile, journal)
+    return result
+
+
+def _remap_file(result, file_path, rules, output_path, dry_run, profile, journal):
+    try:
+        scan = prescan(file_path)
+        if scan['score'] is False:
+            result['status'] = 'ignored'
+            result['reason'] = (f"Root-Element <{scan['root']}>" if scan['root']
+                                else "kein XML")
+            return
+
+        header = read_score_header(file_path)
+        result['parts'] = len(header.parts)
+
+        mappings = {}
+        for part in header.parts:
+            for key, instrument in sound_mapping_keys(part):
+                sound = profile.lookup(fingerprint(part, instrument)) if profile is not None else None
+                if sound:
+                    result['profiled'] += 1
+                elif rules is not None:
+                    sound = resolve_sound(part, rules, instrument)
+                if sound:
+                    mappings[key] = sound
+
+        result['changed'] = apply_sound_mappings(header, mappings)
+        if result['changed'] == 0:
+            result['status'] = 'unchanged'
+        if not dry_run and (result['changed'] or output_path):
+            if output_path:
+                # Erst hier anlegen: ein Probelauf soll keine Verzeichnisse hinterlassen
+                os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            write_score(header, output_path or file_path, journal)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
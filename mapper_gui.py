@@ -0,0 +1,330 @@
+"""Oberfläche des MusicXML Instrument Mappers (Tk)."""
+import tkinter as tk
+from tkinter import filedialog, ttk, messagebox
+from pathlib import Path
+import queue
+import sys
+import threading
+
+import diagnostics
+from diagnostics_panel import DiagnosticsPanel
+from mapper_core import (
+    CATEGORIES, read_score_header, guess_category,
+    apply_sound_mappings, write_score, sound_mapping_keys
+)
+from instrument_classifier import default_classifier
+from mapping_grid import MappingGrid
+from mapping_profiles import MappingProfile, default_profile_path, fingerprint
+from sound_catalog import SoundCatalog, load_sound_libraries
+
+class MusicXMLInstrumentMapper:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("MusicXML Instrument Mapper")
+        self.root.geometry("1024x768")
+        
+        # Initialisierung für Sound-Libraries
+        self.sound_catalog = SoundCatalog()
+        
+        # Fallback-Sound-Libraries, falls keine gefunden werden
+        self.default_libraries = {
+            "CineSamples": {
+                "Strings": ["strings.violin.cinesamples", "strings.viola.cinesamples"],
+                "Woodwinds": ["woodwinds.flute.cinesamples", "woodwinds.oboe.cinesamples"],
+                "Brass": ["brass.trumpet.cinesamples", "brass.horn.cinesamples"],
+                "Percussion": ["percussion.timpani.cinesamples", "percussion.cymbals.cinesamples"]
+            },
+            "Orchestral Tools": {
+                "Strings": ["strings.violin.berlin", "strings.viola.berlin"],
+                "Woodwinds": ["woodwinds.flute.berlin", "woodwinds.oboe.berlin"],
+                "Brass": ["brass.trumpet.berlin", "brass.horn.berlin"],
+                "Percussion": ["percussion.timpani.berlin", "percussion.cymbals.berlin"]
+            }
+        }
+        
+        # Standard-Kategorien für Instrumentenerkennung
+        self.instrument_classifier = default_classifier()
+        
+        # Gespeicherte Zuordnungen früherer Partituren werden beim Analysieren übernommen
+        try:
+            self.mapping_profile = MappingProfile.load(default_profile_path())
+        except (OSError, ValueError):
+            self.mapping_profile = MappingProfile(default_profile_path())
+        
+        # Hauptframe erstellen
+        self.main_frame = ttk.Frame(root, padding="10")
+        self.main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Dateiauswahl
+        file_frame = ttk.Frame(self.main_frame)
+        file_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(file_frame, text="MusicXML Datei:").pack(side=tk.LEFT)
+        self.file_path_var = tk.StringVar()
+        ttk.Entry(file_frame, textvariable=self.file_path_var, width=50).pack(side=tk.LEFT, padx=5)
+        ttk.Button(file_frame, text="Durchsuchen...", command=self.browse_file).pack(side=tk.LEFT)
+        ttk.Button(file_frame, text="Analyse", command=self.analyze_file).pack(side=tk.LEFT, padx=5)
+        
+        # Instrument-Mapping-Frame
+        self.mapping_frame = ttk.LabelFrame(self.main_frame, text="Instrument Mapping")
+        self.mapping_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        
+        # Tabelle mit einem gemeinsamen Editor, unabhängig von der Anzahl der Parts
+        self.mapping_grid = MappingGrid(self.mapping_frame, lambda: self.sound_catalog, CATEGORIES)
+        
+        # Aktionsbuttons
+        action_frame = ttk.Frame(self.main_frame)
+        action_frame.pack(fill=tk.X, pady=10)
+        
+        ttk.Button(action_frame, text="Speichern", command=self.save_changes).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(action_frame, text="Als neu speichern", command=self.save_as_new).pack(side=tk.RIGHT)
+        if diagnostics.is_enabled():
+            # Nur mit MUSICXML_MAPPER_DIAGNOSTICS=1 sichtbar
+            ttk.Button(action_frame, text="Diagnose", command=self.show_diagnostics).pack(side=tk.LEFT)
+        
+        # Status-Label
+        self.status_var = tk.StringVar(value="Bereit")
+        status_label = ttk.Label(self.main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
+        status_label.pack(fill=tk.X, side=tk.BOTTOM)
+        
+        # Initialisiere Variablen
+        self.score_header = None
+        self.instrument_mappings = []
+        
+        # Bis die MuseScore-Sounds geladen sind, stehen die Standard-Bibliotheken zur Auswahl
+        self.sound_catalog = SoundCatalog.from_libraries(self.default_libraries)
+        self.sounds_loaded = False
+        
+        # Die Suche läuft im Hintergrund, damit das Fenster sofort bedienbar ist
+        self.sound_queue = queue.Queue()
+        self.load_musescore_sounds()
+        
+    def browse_file(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("MusicXML files", "*.xml *.musicxml *.mxl"), ("All files", "*.*")]
+        )
+        if file_path:
+            self.file_path_var.set(file_path)
+    
+    def analyze_file(self):
+        file_path = self.file_path_var.get()
+        if not file_path:
+            messagebox.showerror("Fehler", "Bitte wählen Sie eine Datei aus.")
+            return
+            
+        try:
+            # Lies nur den Kopf der Datei (part-list), nicht die ganze Partitur;
+            # ist die Datei seit der letzten Analyse unverändert, wird der Kopf wiederverwendet
+            header = self.score_header
+            if header is None or header.file_path != file_path or not header.is_current():
+                self.score_header = read_score_header(file_path)
+            
+            with diagnostics.phase('analyze.build_rows') as p:
+                profiled = self._build_mapping_rows()
+                p.add('rows', len(self.instrument_mappings))
+            
+            self.mapping_grid.set_rows(self.instrument_mappings)
+            
+            self.status_var.set(f"{len(self.instrument_mappings)} Instrumente in "
+                                f"{len(self.score_header.parts)} Parts gefunden, "
+                                f"{profiled} aus dem Profil übernommen.")
+            
+        except Exception as e:
+            messagebox.showerror("Fehler", f"Fehler beim Analysieren der Datei: {str(e)}")
+            self.status_var.set("Fehler bei der Analyse.")
+    
+    def _build_mapping_rows(self):
+        """Erzeugt die Tabellenzeilen; liefert die Anzahl der Sounds aus dem Profil."""
+        libraries = list(self.sound_catalog.libraries.keys())
+        self.instrument_mappings = []
+        profiled = 0
+        
+        # Für jedes gefundene Instrument (Parts mit mehreren score-instruments
+        # bekommen eine Zeile pro Instrument, z.B. Schlagzeug-Sets)
+        for part in self.score_header.parts:
+            for key, instrument in sound_mapping_keys(part):
+                name = part['part_name']
+                original_sound = part['instrument_sound']
+                category = None
+                if instrument is not None:
+                    instrument_name = instrument['instrument_name'] or instrument['instrument_id']
+                    name = f"{name}: {instrument_name}"
+                    if instrument['midi_unpitched']:
+                        # Set-Instrumente mit gleichem Namen bleiben unterscheidbar
+                        name += f" (Note {instrument['midi_unpitched']})"
+                    original_sound = instrument['instrument_sound']
+                    category = guess_category(instrument_name, self.instrument_classifier)
+                    
+                # Standard-Bibliothek und erratene Kategorie (Instrumentname vor Part-Name)
+                library = libraries[0] if libraries else ""
+                category = (category or guess_category(part['part_name'], self.instrument_classifier)
+                            or CATEGORIES[0])
+                sounds = self.sound_catalog.sounds(library, category)
+                sound = sounds[0] if sounds else ""
+                    
+                # Bekannte Besetzung: Sound aus dem Profil übernehmen
+                part_fingerprint = fingerprint(part, instrument)
+                profile_sound = self.mapping_profile.lookup(part_fingerprint)
+                if profile_sound:
+                    sound = profile_sound
+                    library, category = self.sound_catalog.location(sound) or (library, category)
+                    profiled += 1
+                    
+                self.instrument_mappings.append({
+                    'key': key,
+                    'fingerprint': part_fingerprint,
+                    'part_id': part['part_id'],
+                    'part_name': name,
+                    'library': library,
+                    'category': category,
+                    'instrument': sound,
+                    'original_sound': original_sound
+                })
+        return profiled
+    
+    def show_diagnostics(self):
+        DiagnosticsPanel(self.root)
+    
+    def save_changes(self):
+        self.save_to(self.file_path_var.get())
+    
+    def save_to(self, target_path):
+        if not self.instrument_mappings:
+            messagebox.showerror("Fehler", "Keine Daten zum Speichern vorhanden.")
+            return
+        
+        try:
+            mappings = {
+                mapping['key']: mapping['instrument']
+                for mapping in self.instrument_mappings
+            }
+            apply_sound_mappings(self.score_header, mappings)
+            
+            # Nur die part-list wird neu geschrieben, der Rest der Datei wird kopiert;
+            # die Zieldatei wird erst nach vollständigem Schreiben atomar ersetzt
+            write_score(self.score_header, target_path)
+            
+            messagebox.showinfo("Erfolg", "Änderungen wurden gespeichert!")
+            self.status_var.set("Änderungen gespeichert.")
+            self.update_mapping_profile()
+            
+        except Exception as e:
+            messagebox.showerror("Fehler", f"Fehler beim Speichern der Änderungen: {str(e)}")
+            self.status_var.set("Fehler beim Speichern.")
+    
+    def save_as_new(self):
+        if not self.instrument_mappings:
+            messagebox.showerror("Fehler", "Keine Daten zum Speichern vorhanden.")
+            return
+        
+        # Komprimierte Dateien bleiben komprimiert
+        if self.score_header.archive_member:
+            extension, filetypes = ".mxl", [("Compressed MusicXML files", "*.mxl")]
+        else:
+            extension, filetypes = ".xml", [("MusicXML files", "*.xml *.musicxml")]
+        
+        new_file_path = filedialog.asksaveasfilename(
+            defaultextension=extension,
+            filetypes=filetypes + [("All files", "*.*")],
+            initialdir=str(Path(self.file_path_var.get()).parent)
+        )
+        
+        if new_file_path:
+            self.save_to(new_file_path)
+    
+    def update_mapping_profile(self):
+        """Merkt sich die gespeicherten Zuordnungen für künftige Partituren."""
+        learned = 0
+        for mapping in self.instrument_mappings:
+            if self.mapping_profile.learn(mapping['fingerprint'], mapping['instrument']):
+                learned += 1
+        if not learned:
+            return
+        try:
+            self.mapping_profile.save()
+        except OSError as e:
+            self.status_var.set(f"Änderungen gespeichert, Profil konnte nicht gespeichert werden: {e}")
+    
+    def load_musescore_sounds(self):
+        """Sucht im Hintergrund nach installierten MuseScore-Sounds und lädt diese dynamisch."""
+        self.status_var.set("Suche nach MuseScore-Sounds...")
+        
+        threading.Thread(target=self._discover_sounds, daemon=True).start()
+        self.root.after(100, self._poll_sound_queue)
+    
+    def _discover_sounds(self):
+        """Läuft im Worker-Thread; Ergebnisse gehen nur über die Queue an die Oberfläche."""
+        try:
+            # Unveränderte Metadaten-Dateien werden aus dem Cache geladen
+            catalog, report = load_sound_libraries(
+                on_file=lambda metadata_file, records: self.sound_queue.put(('file', metadata_file, records))
+            )
+            # Den Suchindex hier aufbauen, damit die erste Suche in der Oberfläche nicht stockt
+            catalog.build_index()
+            self.sound_queue.put(('done', report, catalog))
+        except Exception as e:
+            self.sound_queue.put(('error', str(e)))
+    
+    def _poll_sound_queue(self):
+        """Übernimmt geladene Bibliotheken im Tk-Thread und aktualisiert die Auswahllisten."""
+        finished = False
+        changed = False
+        try:
+            while True:
+                message = self.sound_queue.get_nowait()
+                if message[0] == 'file':
+                    _, metadata_file, records = message
+                    if self.sounds_loaded:
+                        changed = self.sound_catalog.add_records(records) or changed
+                    else:
+                        # Erste Bibliothek mit Sounds ersetzt die Standard-Bibliotheken;
+                        # leere Metadaten-Dateien lassen die Auswahl unverändert
+                        catalog = SoundCatalog()
+                        if catalog.add_records(records):
+                            self.sound_catalog = catalog
+                            self.sounds_loaded = True
+                            changed = True
+                    self.status_var.set(f"MuseSound-Bibliotheken geladen aus {metadata_file}")
+                elif message[0] == 'done':
+                    finished = True
+                    _, report, catalog = message
+                    if len(catalog):
+                        # Gleicher Inhalt wie der schrittweise gefüllte Katalog, aber mit Index
+                        self.sound_catalog = catalog
+                    self._report_sound_loading(report)
+                else:
+                    finished = True
+                    self.status_var.set(f"Fehler beim Laden der Metadaten: {message[1]}")
+        except queue.Empty:
+            pass
+        
+        if changed:
+            # Neue Sounds stehen in der Tabelle ohnehin beim nächsten Bearbeiten zur Wahl
+            self.mapping_grid.refresh_editor()
+        if not finished:
+            self.root.after(100, self._poll_sound_queue)
+    
+    def _report_sound_loading(self, report):
+        if not report['files']:
+            self.status_var.set("Keine MuseSound-Metadaten gefunden, verwende Standard-Bibliotheken.")
+        elif report['errors']:
+            metadata_file, error = report['errors'][-1]
+            self.status_var.set(f"Fehler beim Laden der Metadaten: {error}")
+        else:
+            self.status_var.set(f"MuseSound-Bibliotheken erfolgreich geladen aus {report['files'][-1]}")
+
+
+def run_gui():
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Die Oberfläche kann nicht gestartet werden ({e}).\n"
+              "Ohne Display steht die Kommandozeile zur Verfügung, siehe --help.", file=sys.stderr)
+        return 1
+    app = MusicXMLInstrumentMapper(root)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    run_gui()
@@ -0,0 +1,463 @@
+"""Überwachungsmodus: ordnet neue oder geänderte Partituren in einem Ordner automatisch zu.
+
+Unter Linux werden Änderungen per inotify gemeldet, sonst wird der Ordner
+regelmäßig durchsucht. Eine Datei wird erst verarbeitet, wenn sich Größe und
+Änderungszeit eine Weile nicht mehr geändert haben (halb kopierte Exporte).
+Bereits verarbeitete Inhalte (SHA-256) stehen in einer kleinen SQLite-Datenbank,
+sodass auch ein Neustart oder die eigenen Schreibvorgänge nichts doppelt auslösen.
+
+Beispiel:
+    python mapper_watch.py exporte/ --profile default.json --workers 4
+"""
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import signal
+import sqlite3
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from atomic_io import file_digest
+from mapper_cli import SCORE_EXTENSIONS
+from mapper_core import file_stamp, load_mapping_rules, remap_file
+from mapping_profiles import MappingProfile, default_profile_path
+from sound_catalog import user_cache_dir
+
+# Standardwerte für Entprellung und Abfrageintervall (Sekunden)
+SETTLE_SECONDS = 2.0
+POLL_INTERVAL = 1.0
+
+# inotify-Konstanten (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+
+def is_score_file(path):
+    """Partituren erkennen; eigene temporäre Dateien (.mapper-*.tmp) zählen nicht dazu."""
+    name = os.path.basename(path)
+    return not name.startswith('.') and name.lower().endswith(SCORE_EXTENSIONS)
+
+
+def is_excluded(path, excluded):
+    """True, wenn path einer der (realpath-)Ordner in excluded ist oder darin liegt."""
+    if not excluded:
+        return False
+    real = os.path.realpath(path)
+    return any(real == directory or real.startswith(directory + os.sep) for directory in excluded)
+
+
+def _subdirectories(dirpath, dirnames, excluded):
+    return sorted(name for name in dirnames
+                  if not name.startswith('.') and not is_excluded(os.path.join(dirpath, name), excluded))
+
+
+def scan_folder(root, recursive=False, excluded=()):
+    """Alle Partituren unterhalb von root, ohne die Ordner in excluded (z.B. das Ausgabeverzeichnis)."""
+    if not recursive:
+        return [os.path.join(root, name) for name in sorted(os.listdir(root))
+                if is_score_file(name) and os.path.isfile(os.path.join(root, name))]
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = _subdirectories(dirpath, dirnames, excluded)
+        paths.extend(os.path.join(dirpath, name) for name in sorted(filenames) if is_score_file(name))
+    return paths
+
+
+class PollingWatcher:
+    """Sucht den Ordner in festen Abständen nach neuen oder geänderten Dateien ab."""
+
+    def __init__(self, root, recursive=False, interval=POLL_INTERVAL, excluded=()):
+        self.root = root
+        self.recursive = recursive
+        self.interval = interval
+        self.excluded = excluded
+        self._stamps = {path: file_stamp(path) for path in scan_folder(root, recursive, excluded)}
+        self._next_scan = time.monotonic() + interval
+
+    def poll(self, timeout):
+        """Geänderte Pfade; der Ordner wird höchstens einmal pro Intervall durchsucht."""
+        remaining = self._next_scan - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0, remaining))
+        self._next_scan = time.monotonic() + self.interval
+
+        changed = []
+        stamps = {}
+        for path in scan_folder(self.root, self.recursive, self.excluded):
+            stamp = file_stamp(path)
+            stamps[path] = stamp
+            if self._stamps.get(path) != stamp:
+                changed.append(path)
+        self._stamps = stamps
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Liest inotify-Ereignisse über ctypes (nur Linux)."""
+
+    def __init__(self, root, recursive=False, excluded=()):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fehlgeschlagen")
+        self.root = root
+        self.recursive = recursive
+        self.excluded = excluded
+        self._dirs = {}
+        try:
+            self._add_watch(root)
+            if recursive:
+                for dirpath, dirnames, _ in os.walk(root):
+                    dirnames[:] = _subdirectories(dirpath, dirnames, excluded)
+                    for name in dirnames:
+                        self._add_watch(os.path.join(dirpath, name))
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch fehlgeschlagen: {path}")
+        self._dirs[wd] = path
+
+    def poll(self, timeout):
+        """Geänderte Pfade seit dem letzten Aufruf; None bei Überlauf (alles neu einlesen)."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        changed = []
+        rescan = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    # Neue Unterordner mit überwachen und ihren Inhalt einlesen
+                    if (self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith('.')
+                            and not is_excluded(path, self.excluded)):
+                        try:
+                            self._add_watch(path)
+                        except OSError:
+                            pass
+                        changed.extend(scan_folder(path, True, self.excluded))
+                elif is_score_file(path):
+                    changed.append(path)
+
+        return None if rescan else changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(root, recursive=False, polling=False, interval=POLL_INTERVAL, excluded=()):
+    """inotify-Watcher unter Linux, sonst (oder bei Fehlern) der Polling-Watcher."""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root, recursive, excluded)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, recursive, interval, excluded)
+
+
+def default_state_path(root):
+    """Zustandsdatenbank pro überwachtem Ordner im Cache-Verzeichnis."""
+    key = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(user_cache_dir(), f"watch-{key}.sqlite")
+
+
+class WatchState:
+    """Persistente Liste verarbeiteter Dateien und Inhalts-Hashes (SQLite)."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER,
+                digest TEXT, status TEXT, processed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS digests (digest TEXT PRIMARY KEY);
+        ''')
+
+    def is_current(self, path, stamp):
+        """True, wenn die Datei mit dieser Änderungszeit und Größe schon erfasst ist."""
+        row = self.db.execute('SELECT mtime_ns, size FROM files WHERE path = ?', (path,)).fetchone()
+        return row is not None and tuple(row) == tuple(stamp)
+
+    def has_digest(self, digest):
+        return self.db.execute('SELECT 1 FROM digests WHERE digest = ?', (digest,)).fetchone() is not None
+
+    def record(self, path, stamp, digests, status):
+        """Speichert den Stand einer Datei; die übergebenen Hashes gelten als fertig zugeordnet."""
+        mtime_ns, size = stamp or (None, None)
+        digests = [digest for digest in digests if digest]
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                            (path, mtime_ns, size, digests[-1] if digests else None, status, time.time()))
+            self.db.executemany('INSERT OR IGNORE INTO digests VALUES (?)', [(d,) for d in digests])
+
+    def close(self):
+        self.db.close()
+
+
+def _remap(job):
+    """Worker: Datei zuordnen und den Hash des Ergebnisses liefern (muss auf Modulebene liegen)."""
+    path, output_path, rules, profile, dry_run = job
+    result = remap_file(path, rules, output_path, dry_run, profile)
+    target = output_path or path
+    result['digest'] = None
+    if result['status'] == 'changed' and not dry_run and not output_path:
+        # Die eigene Änderung soll beim nächsten Ereignis nicht erneut verarbeitet werden
+        result['digest'] = file_digest(target)
+    return result
+
+
+class FolderWatcher:
+    """Verbindet Watcher, Entprellung, Zustandsdatenbank und Worker-Pool."""
+
+    def __init__(self, root, rules=None, profile=None, state=None, output_dir=None, workers=None,
+                 recursive=False, polling=False, settle=SETTLE_SECONDS, poll_interval=POLL_INTERVAL,
+                 dry_run=False, on_result=None):
+        self.root = root
+        self.rules = rules
+        self.profile = profile
+        self.state = state
+        self.output_dir = output_dir
+        # Eigene Ergebnisse in einem Ausgabeverzeichnis innerhalb von root nicht erneut verarbeiten
+        self.excluded = [os.path.realpath(output_dir)] if output_dir else []
+        self.workers = workers or os.cpu_count() or 1
+        self.recursive = recursive
+        self.polling = polling
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.dry_run = dry_run
+        self.on_result = on_result
+        # Höchstens so viele Aufträge gleichzeitig unterwegs, der Rest wartet in pending
+        self.max_in_flight = self.workers * 2
+        # path -> (stamp, Zeitpunkt der letzten Änderung) oder None (noch nicht geprüft)
+        self.pending = {}
+        self.in_flight = {}
+        self.counts = {'changed': 0, 'unchanged': 0, 'ignored': 0, 'error': 0, 'skipped': 0}
+        self.stopped = False
+
+    def _output_path(self, path):
+        if not self.output_dir:
+            return None
+        return os.path.join(self.output_dir, os.path.relpath(path, self.root))
+
+    def queue(self, paths):
+        for path in paths:
+            if not is_excluded(path, self.excluded):
+                self.pending[path] = None
+
+    def _submit_ready(self, executor):
+        now = time.monotonic()
+        for path in list(self.pending):
+            if len(self.in_flight) >= self.max_in_flight:
+                break
+            if any(path == running for running, _, _ in self.in_flight.values()):
+                continue
+            stamp = file_stamp(path)
+            if stamp is None:
+                del self.pending[path]
+                continue
+            previous = self.pending[path]
+            if previous is None or previous[0] != stamp:
+                self.pending[path] = (stamp, now)
+                continue
+            if now - previous[1] < self.settle:
+                continue
+
+            del self.pending[path]
+            if self.state.is_current(path, stamp):
+                continue
+            try:
+                digest = file_digest(path)
+            except OSError:
+                continue
+            if self.state.has_digest(digest):
+                self.state.record(path, stamp, [digest], 'skipped')
+                self.counts['skipped'] += 1
+                continue
+
+            job = (path, self._output_path(path), self.rules, self.profile, self.dry_run)
+            self.in_flight[executor.submit(_remap, job)] = (path, stamp, digest)
+
+    def _collect(self, timeout):
+        if not self.in_flight:
+            return
+        done, _ = wait(list(self.in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, stamp, digest = self.in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'file': path, 'parts': 0, 'changed': 0, 'profiled': 0, 'status': 'error',
+                          'reason': None, 'error': str(e), 'digest': None}
+            self.counts[result['status']] += 1
+            if result['status'] != 'error' and not self.dry_run:
+                # Nur Inhalte im Endzustand gelten als verarbeitet: das neu geschriebene
+                # Ergebnis oder eine Datei, an der sich nichts ändern musste
+                if result['digest']:
+                    self.state.record(path, file_stamp(path), [result['digest']], result['status'])
+                elif self.output_dir:
+                    self.state.record(path, stamp, [], result['status'])
+                else:
+                    self.state.record(path, stamp, [digest], result['status'])
+            if self.on_result:
+                self.on_result(result)
+
+    def run(self, once=False):
+        """Verarbeitet vorhandene Dateien und wartet dann auf neue (bis stop() oder once)."""
+        watcher = None if once else create_watcher(self.root, self.recursive, self.polling,
+                                                   self.poll_interval, self.excluded)
+        self.queue(scan_folder(self.root, self.recursive, self.excluded))
+        if once:
+            # Vorhandene Dateien sind fertig geschrieben, nicht entprellen
+            self.settle = 0
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while not self.stopped:
+                    self._submit_ready(executor)
+                    if once:
+                        if not self.pending and not self.in_flight:
+                            break
+                        self._collect(None if not self.pending else 0.05)
+                        continue
+
+                    timeout = min(self.poll_interval, self.settle / 2) if self.pending else self.poll_interval
+                    if self.in_flight:
+                        # Auf das nächste Ergebnis warten, Ereignisse danach nur abholen
+                        self._collect(timeout)
+                        paths = watcher.poll(0)
+                    else:
+                        paths = watcher.poll(timeout)
+                    self.queue(scan_folder(self.root, self.recursive, self.excluded) if paths is None else paths)
+            finally:
+                if watcher is not None:
+                    watcher.close()
+                # Laufende Aufträge abschließen, damit der Zustand vollständig gespeichert ist
+                while self.in_flight:
+                    self._collect(None)
+        return self.counts
+
+    def stop(self, *args):
+        self.stopped = True
+
+
+def _print_result(result):
+    stamp = time.strftime('%H:%M:%S')
+    if result['status'] == 'error':
+        print(f"{stamp} FEHLER      {result['file']}: {result['error']}", flush=True)
+    elif result['status'] == 'unchanged':
+        print(f"{stamp} unverändert {result['file']}", flush=True)
+    elif result['status'] == 'ignored':
+        print(f"{stamp} übersprungen {result['file']} (keine Partitur: {result['reason']})", flush=True)
+    else:
+        print(f"{stamp} geändert    {result['file']} ({result['changed']} Sounds)", flush=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Überwacht einen Ordner und ordnet neue MusicXML-Dateien automatisch zu."
+    )
+    parser.add_argument('folder', help="Zu überwachender Ordner")
+    parser.add_argument('-p', '--profile', help="Mapping-Profil (Standard: das Profil der GUI)")
+    parser.add_argument('-r', '--rules', help="Mapping-Regeldatei (JSON) für Parts ohne Profiltreffer")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Anzahl paralleler Prozesse (Standard: alle Kerne)")
+    parser.add_argument('-o', '--output-dir', help="Ergebnisse hierhin schreiben statt die Dateien zu überschreiben")
+    parser.add_argument('--state', help="Zustandsdatenbank (Standard: im Cache-Verzeichnis)")
+    parser.add_argument('--recursive', action='store_true', help="Unterverzeichnisse überwachen")
+    parser.add_argument('--polling', action='store_true', help="Ordner abfragen statt inotify zu verwenden")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help="Sekunden ohne Änderung, bevor eine Datei verarbeitet wird")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="Abfrageintervall in Sekunden")
+    parser.add_argument('--once', action='store_true', help="Nur vorhandene Dateien verarbeiten und beenden")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="Nichts schreiben, nur berichten")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Keine Ausgabe pro Datei")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.folder):
+        print(f"{args.folder} ist kein Ordner.", file=sys.stderr)
+        return 2
+    if args.output_dir and os.path.realpath(args.output_dir) == os.path.realpath(args.folder):
+        print("Das Ausgabeverzeichnis darf nicht der überwachte Ordner selbst sein.", file=sys.stderr)
+        return 2
+
+    try:
+        rules = load_mapping_rules(args.rules) if args.rules else None
+        profile = MappingProfile.load(args.profile or default_profile_path())
+    except (OSError, ValueError) as e:
+        print(f"Fehler beim Laden von Regeln oder Profil: {e}", file=sys.stderr)
+        return 2
+    if rules is None and not len(profile):
+        print("Das Profil ist leer, bitte --rules angeben.", file=sys.stderr)
+        return 2
+
+    state = WatchState(args.state or default_state_path(args.folder))
+    watcher = FolderWatcher(
+        args.folder, rules, profile, state, args.output_dir, args.workers, args.recursive,
+        args.polling, args.settle, args.interval, args.dry_run,
+        None if args.quiet else _print_result
+    )
+    signal.signal(signal.SIGTERM, watcher.stop)
+    signal.signal(signal.SIGINT, watcher.stop)
+
+    try:
+        counts = watcher.run(args.once)
+    finally:
+        state.close()
+
+    print(f"{counts['changed']} geändert, {counts['unchanged']} unverändert, "
+          f"{counts['ignored']} keine Partitur, {counts['skipped']} bereits verarbeitet, "
+          f"{counts['error']} Fehler")
+    return 1 if counts['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Tabelle für die Instrument-Zuordnung mit einem einzigen, wiederverwendeten Editor.
+
+Statt pro Part eigene Widgets zu erzeugen, werden die Zeilen als Einträge
+eines ttk.Treeview dargestellt. Bearbeitet wird über eine Combobox, die beim
+Doppelklick über die jeweilige Zelle gelegt wird. Die Anzahl der Widgets ist
+damit unabhängig von der Anzahl der Parts.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+# Spalten der Tabelle: (Schlüssel im Datenmodell, Überschrift, Breite)
+COLUMNS = [
+    ('part_name', "Original Name", 180),
+    ('library', "Sound Library", 140),
+    ('category', "Kategorie", 120),
+    ('instrument', "Instrument", 220),
+    ('preview', "Vorschau", 240)
+]
+
+# Spalten, die über den Editor geändert werden können
+EDITABLE_COLUMNS = ('library', 'category', 'instrument')
+
+# Maximale Anzahl Treffer, die die Type-ahead-Suche im Instrument-Editor anzeigt
+INSTRUMENT_SEARCH_LIMIT = 200
+
+# Tasten, die das Dropdown bedienen und die Filterung nicht auslösen
+NAVIGATION_KEYS = ('Up', 'Down', 'Left', 'Right', 'Return', 'Escape', 'Tab')
+
+
+class MappingGrid:
+    """Zeigt eine Liste von Mapping-Dicts an und schreibt Änderungen direkt in diese zurück.
+
+    Jede Zeile ist ein Dict mit den Schlüsseln key (Mapping-Schlüssel), part_id,
+    part_name, library, category, instrument und original_sound. get_catalog() liefert den
+    aktuellen SoundCatalog, damit nachgeladene Sounds sofort verfügbar sind.
+    """
+
+    def __init__(self, parent, get_catalog, categories):
+        self.get_catalog = get_catalog
+        self.categories = list(categories)
+        self.rows = []
+        self._editing = None
+
+        self.tree = ttk.Treeview(parent, columns=[key for key, _, _ in COLUMNS],
+                                 show='headings', selectmode='browse')
+        for key, heading, width in COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, stretch=True)
+
+        scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._on_scroll)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # Ein einziger Editor für alle Zellen
+        self.editor_var = tk.StringVar()
+        self.editor = ttk.Combobox(self.tree, textvariable=self.editor_var)
+        self.editor.bind('<<ComboboxSelected>>', lambda e: self.commit_edit())
+        self.editor.bind('<Return>', lambda e: self.commit_edit())
+        self.editor.bind('<Escape>', lambda e: self.cancel_edit())
+        self.editor.bind('<FocusOut>', self._on_editor_focus_out)
+        self.editor.bind('<KeyRelease>', self._filter_editor)
+
+        self.tree.bind('<Double-1>', self._on_double_click)
+        self.tree.bind('<Return>', self._on_return)
+        self.tree.bind('<MouseWheel>', lambda e: self.cancel_edit(), add='+')
+        self.tree.bind('<Button-4>', lambda e: self.cancel_edit(), add='+')
+        self.tree.bind('<Button-5>', lambda e: self.cancel_edit(), add='+')
+        self.tree.bind('<Configure>', lambda e: self.cancel_edit(), add='+')
+
+    def set_rows(self, rows):
+        """Ersetzt den Inhalt der Tabelle durch die übergebenen Zeilen."""
+        self.cancel_edit()
+        self.tree.delete(*self.tree.get_children())
+        self.rows = rows
+        for idx, row in enumerate(rows):
+            self.tree.insert('', tk.END, iid=str(idx), values=self._row_values(row))
+
+    def refresh_row(self, idx):
+        self.tree.item(str(idx), values=self._row_values(self.rows[idx]))
+
+    def _row_values(self, row):
+        return [row['instrument'] if key == 'preview' else row[key] for key, _, _ in COLUMNS]
+
+    def _on_scroll(self, *args):
+        self.cancel_edit()
+        self.tree.yview(*args)
+
+    def _on_double_click(self, event):
+        if self.tree.identify_region(event.x, event.y) != 'cell':
+            return
+        item = self.tree.identify_row(event.y)
+        column_index = int(self.tree.identify_column(event.x)[1:]) - 1
+        if item and 0 <= column_index < len(COLUMNS):
+            self.begin_edit(item, COLUMNS[column_index][0])
+
+    def _on_return(self, event):
+        # Enter auf einer Zeile bearbeitet direkt das Instrument
+        item = self.tree.focus()
+        if item:
+            self.begin_edit(item, 'instrument')
+
+    def _choices(self, row, key):
+        catalog = self.get_catalog()
+        if key == 'library':
+            return list(catalog.libraries.keys())
+        if key == 'category':
+            return self.categories
+        return catalog.sounds(row['library'], row['category'])
+
+    def begin_edit(self, item, key):
+        """Legt den Editor über die Zelle (item, key)."""
+        if key not in EDITABLE_COLUMNS:
+            return
+        self.commit_edit()
+        self.tree.see(item)
+        bbox = self.tree.bbox(item, key)
+        if not bbox:
+            return
+
+        row = self.rows[int(item)]
+        self._editing = (item, key)
+        self.editor['values'] = self._choices(row, key)
+        self.editor_var.set(row[key])
+        x, y, width, height = bbox
+        self.editor.place(x=x, y=y, width=width, height=height)
+        self.editor.focus_set()
+        self.editor.select_range(0, tk.END)
+
+    def commit_edit(self):
+        """Übernimmt den Editorwert ins Datenmodell und schließt den Editor."""
+        if self._editing is None:
+            return
+        item, key = self._editing
+        self._editing = None
+        self.editor.place_forget()
+
+        idx = int(item)
+        row = self.rows[idx]
+        value = self.editor_var.get().strip()
+        if value == row[key]:
+            return
+
+        row[key] = value
+        if key in ('library', 'category'):
+            # Wie bisher: bei neuer Bibliothek oder Kategorie den ersten passenden Sound wählen
+            sounds = self.get_catalog().sounds(row['library'], row['category'])
+            if sounds:
+                row['instrument'] = sounds[0]
+        self.refresh_row(idx)
+        self.tree.focus_set()
+
+    def cancel_edit(self):
+        if self._editing is None:
+            return
+        self._editing = None
+        self.editor.place_forget()
+
+    def refresh_editor(self):
+        """Aktualisiert die Auswahl des offenen Editors, z.B. nach dem Nachladen von Sounds."""
+        if self._editing is None:
+            return
+        item, key = self._editing
+        self.editor['values'] = self._choices(self.rows[int(item)], key)
+
+    def _on_editor_focus_out(self, event):
+        # Die aufgeklappte Liste nimmt den Fokus, dabei den Editor offen lassen
+        # (Tk-Pfad direkt abfragen, focus_get() kennt das Popdown-Fenster nicht)
+        focus = self.editor.tk.call('focus')
+        if str(focus).startswith(str(self.editor)):
+            return
+        self.commit_edit()
+
+    def _filter_editor(self, event):
+        """Type-ahead: Tippen filtert die Sounds der gewählten Bibliothek."""
+        if self._editing is None or event.keysym in NAVIGATION_KEYS:
+            return
+        item, key = self._editing
+        row = self.rows[int(item)]
+        query = self.editor_var.get()
+        if key != 'instrument' or not query:
+            self.editor['values'] = self._choices(row, key)
+            return
+        self.editor['values'] = self.get_catalog().search(
+            query, row['library'], limit=INSTRUMENT_SEARCH_LIMIT)
@@ -0,0 +1,151 @@
+"""Gespeicherte Mapping-Profile für wiederkehrende Besetzungen.
+
+Ein Profil merkt sich für jedes zugeordnete Instrument einen Fingerabdruck
+aus Part-Name, Instrumentname, ursprünglichem instrument-sound und der Note
+(midi-unpitched, bei Schlagzeug-Sets) sowie den gewählten Ziel-Sound. Beim
+Analysieren weiterer Partituren wird zuerst der vollständige Fingerabdruck
+gesucht, danach weniger genaue Stufen (ohne Original-Sound, nur Part-Name,
+nur Original-Sound). Für einzelne Instrumente eines Parts mit mehreren
+Instrumenten (z.B. Schlagzeug-Sets) gelten nur die ersten beiden Stufen,
+damit ein unbekanntes Set-Instrument nicht den Sound eines anderen erbt. Alle Stufen liegen in
+einem Dict, eine Abfrage kostet also nur wenige Hash-Zugriffe.
+"""
+import json
+import os
+import sys
+
+from atomic_io import atomic_write
+from instrument_classifier import normalize
+
+PROFILE_VERSION = 1
+DEFAULT_PROFILE_NAME = 'default'
+
+
+def user_profile_dir():
+    """Verzeichnis der Mapping-Profile (über MUSICXML_MAPPER_PROFILE_DIR überschreibbar)."""
+    override = os.environ.get("MUSICXML_MAPPER_PROFILE_DIR")
+    if override:
+        return override
+
+    # sys.platform statt des (langsam importierten) platform-Moduls, der CLI-Start bleibt kurz
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~\\AppData\\Roaming")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(base, "musicxml-instrument-mapper", "profiles")
+
+
+def default_profile_path():
+    return os.path.join(user_profile_dir(), DEFAULT_PROFILE_NAME + '.json')
+
+
+def fingerprint(part, instrument=None):
+    """Fingerabdruck (Part-Name, Instrumentname, Original-Sound, Note, Einzelinstrument).
+
+    Ohne instrument wird das einzige bzw. erste Instrument des Parts verwendet;
+    mit instrument gilt der Fingerabdruck einem Instrument eines Parts mit
+    mehreren Instrumenten (siehe sound_mapping_keys()). Die Note (midi-unpitched)
+    hält Set-Instrumente mit gleichem oder fehlendem Namen auseinander.
+    """
+    member = instrument is not None
+    if instrument is None and part.get('instruments'):
+        instrument = part['instruments'][0]
+    note = ''
+    if instrument is not None:
+        instrument_name = instrument['instrument_name'] or ''
+        sound = instrument['instrument_sound'] or ''
+        note = instrument.get('midi_unpitched') or ''
+    else:
+        instrument_name = ''
+        sound = part.get('instrument_sound') or ''
+    return (normalize(part['part_name']), normalize(instrument_name), sound.strip().lower(), note, member)
+
+
+def _lookup_keys(key):
+    """Suchschlüssel eines Fingerabdrucks, vom genauesten zum ungenauesten."""
+    part_name, instrument_name, sound, note, member = key
+    keys = [('full', part_name, instrument_name, sound, note), ('name', part_name, instrument_name, note)]
+    if member:
+        # Unbekannte Set-Instrumente sollen an die Regeln weitergehen
+        return keys
+    keys.append(('part', part_name))
+    if sound:
+        keys.append(('sound', sound))
+    return keys
+
+
+class MappingProfile:
+    """Fingerabdruck -> Ziel-Sound, als JSON gespeichert."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self._index = {}
+
+    @classmethod
+    def load(cls, path):
+        """Lädt ein Profil; eine fehlende Datei ergibt ein leeres Profil."""
+        profile = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return profile
+
+        if not isinstance(data, dict) or data.get('version') != PROFILE_VERSION:
+            raise ValueError(f"Unbekanntes Profilformat: {path}")
+        for entry in data.get('entries', []):
+            if not isinstance(entry, dict) or not entry.get('sound'):
+                continue
+            # midi_unpitched und member fehlen in älteren Profilen
+            key = (entry.get('part_name', ''), entry.get('instrument_name', ''),
+                   entry.get('instrument_sound', ''), entry.get('midi_unpitched', ''),
+                   bool(entry.get('member', False)))
+            profile._set(key, entry['sound'])
+        return profile
+
+    def save(self, path=None):
+        """Schreibt das Profil atomar."""
+        path = path or self.path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        entries = [
+            {'part_name': key[0], 'instrument_name': key[1], 'instrument_sound': key[2],
+             'midi_unpitched': key[3], 'member': key[4], 'sound': sound}
+            for key, sound in self.entries.items()
+        ]
+
+        def produce(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': PROFILE_VERSION, 'entries': entries}, f,
+                          ensure_ascii=False, indent=1)
+
+        atomic_write(path, produce)
+        self.path = path
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _set(self, key, sound):
+        # Neuere Einträge überschreiben ältere auf allen Stufen
+        self.entries.pop(key, None)
+        self.entries[key] = sound
+        for lookup_key in _lookup_keys(key):
+            self._index[lookup_key] = sound
+
+    def learn(self, key, sound):
+        """Merkt sich den Ziel-Sound für einen Fingerabdruck (siehe fingerprint())."""
+        if not sound or self.entries.get(key) == sound:
+            return False
+        self._set(key, sound)
+        return True
+
+    def lookup(self, key):
+        """Gespeicherter Ziel-Sound für einen Fingerabdruck oder None."""
+        for lookup_key in _lookup_keys(key):
+            sound = self._index.get(lookup_key)
+            if sound:
+                return sound
+        return None
@@ -0,0 +1,206 @@
+"""Lesen und Schreiben komprimierter MusicXML-Dateien (.mxl).
+
+Eine .mxl-Datei ist ein ZIP-Archiv, dessen META-INF/container.xml auf die
+eigentliche Partitur verweist. Beim Schreiben werden alle anderen Einträge
+unverändert (ohne Neukomprimierung) kopiert, nur die Partitur wird neu
+komprimiert.
+"""
+import xml.etree.ElementTree as ET
+import struct
+import time
+import zipfile
+import zlib
+
+CONTAINER_PATH = 'META-INF/container.xml'
+
+# ZIP-Strukturen (siehe PKWARE APPNOTE)
+_LOCAL_HEADER = struct.Struct('<4sHHHHHLLLHH')
+_LOCAL_HEADER_SIG = b'PK\x03\x04'
+_CENTRAL_DIR = struct.Struct('<4sBBBBHHHHLLLHHHHHLL')
+_CENTRAL_DIR_SIG = b'PK\x01\x02'
+_END_RECORD = struct.Struct('<4sHHHHLLH')
+_END_RECORD_SIG = b'PK\x05\x06'
+_DATA_DESCRIPTOR_SIG = b'PK\x07\x08'
+_ZIP64_EXTRA_ID = 0x0001
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def is_mxl(file_path):
+    """Prüft anhand der Dateiendung, ob es sich um eine .mxl-Datei handelt."""
+    return str(file_path).lower().endswith('.mxl')
+
+
+def find_rootfile(zf):
+    """Ermittelt den Namen der Partitur im Archiv über META-INF/container.xml."""
+    names = zf.namelist()
+    if CONTAINER_PATH in names:
+        container = ET.fromstring(zf.read(CONTAINER_PATH))
+        for elem in container.iter():
+            if elem.tag.rsplit('}', 1)[-1] == 'rootfile':
+                full_path = elem.get('full-path')
+                media_type = elem.get('media-type', '')
+                # Die erste Rootfile ohne (oder mit MusicXML-)Medientyp ist die Partitur
+                if full_path and (not media_type or 'musicxml' in media_type):
+                    if full_path in names:
+                        return full_path
+
+    # Fallback für Archive ohne gültige container.xml
+    for name in names:
+        if not name.startswith('META-INF/') and name.lower().endswith(('.xml', '.musicxml')):
+            return name
+    raise ValueError("Keine Partitur im .mxl-Archiv gefunden.")
+
+
+def _has_zip64(info):
+    extra = info.extra
+    while len(extra) >= 4:
+        header_id, size = struct.unpack('<HH', extra[:4])
+        if header_id == _ZIP64_EXTRA_ID:
+            return True
+        extra = extra[4 + size:]
+    return False
+
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time[:6]
+    dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_time, dos_date
+
+
+def rewrite_member(src_path, dst_path, member_name, produce):
+    """Schreibt das Archiv src_path nach dst_path und ersetzt dabei member_name.
+
+    produce(source, write) bekommt den entpackten Originalinhalt als Stream
+    und schreibt den neuen Inhalt blockweise über write(bytes). Alle anderen
+    Einträge werden roh kopiert.
+    """
+    with zipfile.ZipFile(src_path) as zin:
+        infos = zin.infolist()
+        if any(_has_zip64(info) for info in infos):
+            # Zip64-Archive sind für Partituren unüblich, hier einfach neu packen
+            _rewrite_with_zipfile(zin, dst_path, member_name, produce)
+            return
+
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            central = []
+            for info in infos:
+                offset = dst.tell()
+                if info.filename == member_name:
+                    entry = _write_deflated(zin, info, dst, produce)
+                else:
+                    entry = _copy_raw(src, info, dst)
+                central.append((info, offset) + entry)
+
+            _write_central_directory(dst, central, zin.comment)
+
+
+def _copy_raw(src, info, dst):
+    """Kopiert einen Eintrag samt lokalem Header unverändert."""
+    src.seek(info.header_offset)
+    header = src.read(_LOCAL_HEADER.size)
+    fields = _LOCAL_HEADER.unpack(header)
+    if fields[0] != _LOCAL_HEADER_SIG:
+        raise ValueError(f"Ungültiger lokaler ZIP-Header für {info.filename}.")
+    name_length, extra_length = fields[9], fields[10]
+    name_and_extra = src.read(name_length + extra_length)
+
+    dst.write(header)
+    dst.write(name_and_extra)
+
+    remaining = info.compress_size
+    if info.flag_bits & _FLAG_DATA_DESCRIPTOR:
+        # Datenbeschreibung (CRC und Größen) folgt den Daten, optional mit Signatur
+        position = src.tell()
+        src.seek(position + info.compress_size)
+        remaining += 16 if src.read(4) == _DATA_DESCRIPTOR_SIG else 12
+        src.seek(position)
+
+    while remaining > 0:
+        chunk = src.read(min(remaining, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise ValueError(f"ZIP-Eintrag {info.filename} ist unvollständig.")
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+    name = name_and_extra[:name_length]
+    return (name, info.compress_type, info.flag_bits, info.CRC,
+            info.compress_size, info.file_size, _dos_date_time(info.date_time))
+
+
+def _write_deflated(zin, info, dst, produce):
+    """Schreibt den neuen Inhalt eines Eintrags deflate-komprimiert."""
+    name = info.filename.encode('utf-8' if info.flag_bits & 0x800 else 'cp437')
+    flags = info.flag_bits & 0x800
+    dos_time, dos_date = _dos_date_time(time.localtime())
+
+    header_offset = dst.tell()
+    dst.write(_LOCAL_HEADER.pack(_LOCAL_HEADER_SIG, 20, flags, zipfile.ZIP_DEFLATED,
+                                 dos_time, dos_date, 0, 0, 0, len(name), 0))
+    dst.write(name)
+
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    state = {'crc': 0, 'size': 0, 'compressed': 0}
+
+    def write(data):
+        state['crc'] = zlib.crc32(data, state['crc'])
+        state['size'] += len(data)
+        compressed = compressor.compress(data)
+        state['compressed'] += len(compressed)
+        dst.write(compressed)
+
+    with zin.open(info) as source:
+        produce(source, write)
+
+    tail = compressor.flush()
+    state['compressed'] += len(tail)
+    dst.write(tail)
+
+    if state['size'] >= 0xFFFFFFFF or state['compressed'] >= 0xFFFFFFFF:
+        raise ValueError("Partitur ist zu groß für ein .mxl-Archiv ohne Zip64.")
+
+    # CRC und Größen im lokalen Header nachtragen
+    end = dst.tell()
+    dst.seek(header_offset + 14)
+    dst.write(struct.pack('<LLL', state['crc'], state['compressed'], state['size']))
+    dst.seek(end)
+
+    return (name, zipfile.ZIP_DEFLATED, flags, state['crc'],
+            state['compressed'], state['size'], (dos_time, dos_date))
+
+
+def _write_central_directory(dst, central, comment):
+    start = dst.tell()
+    for info, offset, name, method, flags, crc, compressed, size, dos in central:
+        if offset >= 0xFFFFFFFF:
+            raise ValueError("Archiv ist zu groß für ein .mxl-Archiv ohne Zip64.")
+        dst.write(_CENTRAL_DIR.pack(
+            _CENTRAL_DIR_SIG, info.create_version, info.create_system,
+            max(info.extract_version, 20) if method == zipfile.ZIP_DEFLATED else info.extract_version,
+            info.reserved, flags, method, dos[0], dos[1], crc, compressed, size,
+            len(name), len(info.extra), len(info.comment), 0,
+            info.internal_attr, info.external_attr, offset
+        ))
+        dst.write(name)
+        dst.write(info.extra)
+        dst.write(info.comment)
+
+    size = dst.tell() - start
+    dst.write(_END_RECORD.pack(_END_RECORD_SIG, 0, 0, len(central), len(central),
+                               size, start, len(comment)))
+    dst.write(comment)
+
+
+def _rewrite_with_zipfile(zin, dst_path, member_name, produce):
+    with zipfile.ZipFile(dst_path, 'w', allowZip64=True) as zout:
+        for info in zin.infolist():
+            if info.filename == member_name:
+                chunks = []
+                with zin.open(info) as source:
+                    produce(source, chunks.append)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                zout.writestr(info, b''.join(chunks))
+            else:
+                zout.writestr(info, zin.read(info))
@@ -0,0 +1,383 @@
+"""Suche und Zwischenspeicherung der installierten MuseScore/MuseHub-Sounds."""
+import bisect
+import json
+import os
+import platform
+import re
+
+from diagnostics import phase
+from instrument_classifier import default_classifier
+
+CACHE_VERSION = 3
+CACHE_FILE_NAME = 'sound-catalog.json'
+
+# Trennzeichen, an denen Sound-IDs und Anzeigenamen in Wörter zerlegt werden
+_TOKEN_SPLIT = re.compile(r'[\s._\-/()]+')
+
+
+def search_paths():
+    """Mögliche Installationspfade von MuseScore je nach Betriebssystem."""
+    paths = []
+
+    system = platform.system()
+    if system == "Windows":
+        program_files = os.environ.get("ProgramFiles", "C:\\Program Files")
+        program_files_x86 = os.environ.get("ProgramFiles(x86)", "C:\\Program Files (x86)")
+
+        paths = [
+            os.path.join(program_files, "MuseScore 4"),
+            os.path.join(program_files_x86, "MuseScore 4"),
+            os.path.join(program_files, "MuseScore 3"),
+            os.path.join(program_files_x86, "MuseScore 3")
+        ]
+
+        # Auch im AppData-Verzeichnis suchen (für MuseHub)
+        appdata = os.environ.get("APPDATA", "")
+        if appdata:
+            paths.append(os.path.join(appdata, "MuseScore", "MuseScore4"))
+            paths.append(os.path.join(appdata, "MuseScore", "MuseScore3"))
+            paths.append(os.path.join(appdata, "MuseHub"))
+
+    elif system == "Darwin":  # macOS
+        paths = [
+            "/Applications/MuseScore 4.app/Contents/Resources",
+            "/Applications/MuseScore 3.app/Contents/Resources",
+            os.path.expanduser("~/Library/Application Support/MuseScore"),
+            os.path.expanduser("~/Library/Application Support/MuseHub")
+        ]
+
+    elif system == "Linux":
+        paths = [
+            "/usr/share/mscore-4.0",
+            "/usr/share/mscore",
+            "/usr/local/share/mscore",
+            os.path.expanduser("~/.local/share/MuseScore"),
+            os.path.expanduser("~/.local/share/MuseHub")
+        ]
+
+    return paths
+
+
+def find_metadata_files(paths=None):
+    """Sucht nach Metadaten-Dateien in den Installationspfaden."""
+    metadata_files = []
+    for path in (search_paths() if paths is None else paths):
+        if not os.path.isdir(path):
+            continue
+
+        # Verschiedene mögliche Speicherorte für die Soundfonts-Metadaten
+        possible_locations = [
+            os.path.join(path, "soundfonts", "muse-sounds-metadata.json"),
+            os.path.join(path, "sounds", "metadata.json"),
+            os.path.join(path, "Soundfonts", "metadata.json")
+        ]
+
+        for loc in possible_locations:
+            if os.path.isfile(loc):
+                metadata_files.append(loc)
+
+    return metadata_files
+
+
+def user_cache_dir():
+    """Verzeichnis für den Sound-Katalog-Cache (über MUSICXML_MAPPER_CACHE_DIR überschreibbar)."""
+    override = os.environ.get("MUSICXML_MAPPER_CACHE_DIR")
+    if override:
+        return override
+
+    system = platform.system()
+    if system == "Windows":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif system == "Darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "musicxml-instrument-mapper")
+
+
+def default_cache_path():
+    return os.path.join(user_cache_dir(), CACHE_FILE_NAME)
+
+
+class SoundCatalog:
+    """Sound-Katalog mit O(1)-Duplikaterkennung und Suchindex.
+
+    libraries bildet Bibliothek -> Kategorie -> Liste der Sound-IDs in
+    Einfügereihenfolge ab. Für die Suche wird bei Bedarf ein sortierter
+    Wortindex (Präfixsuche per bisect) und ein zusammenhängender Suchtext
+    (Teilstringsuche per str.find) aufgebaut.
+    """
+
+    def __init__(self):
+        self.libraries = {}
+        self.display_names = {}
+        self._locations = {}
+        self._index = None
+
+    @classmethod
+    def from_libraries(cls, libraries):
+        catalog = cls()
+        for library_name, categories in libraries.items():
+            for category, sounds in categories.items():
+                for sound_id in sounds:
+                    catalog.add(sound_id, library_name, category)
+        return catalog
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, sound_id):
+        return sound_id in self._locations
+
+    def add(self, sound_id, library_name, category, display_name=''):
+        """Fügt einen Sound hinzu; bereits bekannte IDs werden ignoriert."""
+        if not sound_id or sound_id in self._locations:
+            return False
+        self._locations[sound_id] = (library_name, category)
+        self.display_names[sound_id] = display_name or ''
+        self.libraries.setdefault(library_name, {}).setdefault(category, []).append(sound_id)
+        self._index = None
+        return True
+
+    def add_records(self, records):
+        """Fügt Einträge der Form [sound_id, library, category, display_name] hinzu."""
+        added = 0
+        for record in records:
+            if self.add(*record):
+                added += 1
+        return added
+
+    def records(self):
+        for sound_id, (library_name, category) in self._locations.items():
+            yield [sound_id, library_name, category, self.display_names[sound_id]]
+
+    def sounds(self, library_name, category):
+        return self.libraries.get(library_name, {}).get(category, [])
+
+    def location(self, sound_id):
+        return self._locations.get(sound_id)
+
+    def build_index(self):
+        """Baut den Suchindex auf (sonst automatisch bei der ersten Suche)."""
+        with phase('catalog.build_index', sounds=len(self._locations)):
+            self._build_index()
+
+    def _build_index(self):
+        postings = {}
+        lines = []
+        starts = []
+        position = 0
+        ids = list(self._locations)
+
+        for sound_id in ids:
+            text = (sound_id + ' ' + self.display_names[sound_id]).lower()
+            for token in _TOKEN_SPLIT.split(text):
+                if token:
+                    postings.setdefault(token, []).append(sound_id)
+            postings.setdefault(sound_id.lower(), []).append(sound_id)
+
+            starts.append(position)
+            lines.append(text)
+            position += len(text) + 1
+
+        self._index = {
+            'keys': sorted(postings),
+            'postings': postings,
+            'blob': '\n'.join(lines),
+            'starts': starts,
+            'ids': ids
+        }
+
+    def search(self, query, library_name=None, category=None, limit=None):
+        """Sucht Sounds nach Präfix (ganze ID oder Wortanfang) und Teilstring.
+
+        Präfixtreffer stehen vor reinen Teilstringtreffern. Ohne Suchbegriff
+        werden alle Sounds der Bibliothek/Kategorie geliefert.
+        """
+        query = query.strip().lower()
+        if not query:
+            if library_name is not None and category is not None:
+                found = list(self.sounds(library_name, category))
+            else:
+                found = [
+                    sound_id for sound_id, location in self._locations.items()
+                    if library_name is None or location[0] == library_name
+                ]
+            return found[:limit] if limit else found
+
+        if self._index is None:
+            self.build_index()
+        index = self._index
+
+        def accept(sound_id):
+            library, sound_category = self._locations[sound_id]
+            return ((library_name is None or library == library_name) and
+                    (category is None or sound_category == category))
+
+        found = {}
+
+        # Präfixtreffer über den sortierten Wortindex
+        keys = index['keys']
+        pos = bisect.bisect_left(keys, query)
+        while pos < len(keys) and keys[pos].startswith(query):
+            for sound_id in index['postings'][keys[pos]]:
+                if sound_id not in found and accept(sound_id):
+                    found[sound_id] = True
+                    if limit and len(found) >= limit:
+                        return list(found)
+            pos += 1
+
+        # Teilstringtreffer über den Suchtext
+        blob = index['blob']
+        pos = blob.find(query)
+        while pos != -1:
+            row = bisect.bisect_right(index['starts'], pos) - 1
+            sound_id = index['ids'][row]
+            if sound_id not in found and accept(sound_id):
+                found[sound_id] = True
+                if limit and len(found) >= limit:
+                    break
+            # Zur nächsten Zeile springen, weitere Treffer derselben Zeile sind uninteressant
+            next_row = row + 1
+            if next_row >= len(index['starts']):
+                break
+            pos = blob.find(query, index['starts'][next_row])
+
+        return list(found)
+
+
+def process_musehub_metadata(data, catalog):
+    """Verarbeitet Metadaten im MuseHub-Format."""
+    sounds = data.get("sounds", [])
+    classifier = default_classifier()
+
+    for sound in sounds:
+        library_name = sound.get("publisher", "Unbekannt")
+        sound_id = sound.get("id", "")
+        display_name = sound.get("displayName", "")
+
+        # Versuche, die Kategorie und den Instrumententyp zu extrahieren
+        category = classifier.classify(sound_id, display_name) or "Andere"
+
+        catalog.add(sound_id, library_name, category, display_name)
+
+
+def process_musescore_metadata(data, catalog):
+    """Verarbeitet Metadaten im MuseScore-Format."""
+    classifier = default_classifier()
+    for sound in data:
+        if not isinstance(sound, dict):
+            continue
+
+        sound_id = sound.get("id", "")
+        if not sound_id:
+            continue
+
+        # Extrahiere den Bibliotheksnamen aus dem Sound-ID
+        library_name = "MuseScore"
+        for possible_lib in ["CineSamples", "Berlin", "Orchestral Tools", "Spitfire"]:
+            if possible_lib.lower() in sound_id.lower():
+                library_name = possible_lib
+                break
+
+        # Normalisiere Bibliotheksnamen
+        if "berlin" in library_name.lower() or "orchestral tools" in library_name.lower():
+            library_name = "Orchestral Tools"
+
+        # Bestimme die Kategorie
+        display_name = sound.get("displayName", sound.get("name", ""))
+        category = classifier.classify(sound_id, display_name) or "Andere"
+
+        catalog.add(sound_id, library_name, category, display_name)
+
+
+def parse_metadata_file(metadata_file):
+    """Liest eine Metadaten-Datei und liefert deren Sounds als Katalog."""
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    catalog = SoundCatalog()
+    # Verarbeite die Metadaten je nach Format
+    if isinstance(data, dict) and "sounds" in data:
+        process_musehub_metadata(data, catalog)
+    elif isinstance(data, list):
+        process_musescore_metadata(data, catalog)
+    return catalog
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def load_cache(cache_path):
+    """Lädt den Katalog-Cache; ein fehlender oder veralteter Cache ergibt {}."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+        return {}
+    return data.get('files', {})
+
+
+def save_cache(cache_path, entries):
+    """Schreibt den Katalog-Cache atomar, Fehler werden ignoriert (der Cache ist optional)."""
+    def produce(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': entries}, f, ensure_ascii=False)
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        atomic_write(cache_path, produce)
+    except OSError:
+        pass
+
+
+def load_sound_libraries(metadata_files=None, cache_path=None, use_cache=True, on_file=None):
+    """Lädt alle Sound-Bibliotheken, unveränderte Metadaten-Dateien kommen aus dem Cache.
+
+    Eine Datei gilt als unverändert, wenn Pfad, Änderungszeit und Größe mit dem
+    Cache-Eintrag übereinstimmen. Liefert (catalog, report); report enthält
+    die gefundenen Dateien, wie viele aus dem Cache kamen und aufgetretene Fehler.
+    on_file(metadata_file, records) wird nach jeder geladenen Datei aufgerufen.
+    """
+    if metadata_files is None:
+        with phase('catalog.probe_paths') as p:
+            metadata_files = find_metadata_files()
+            p.add('files', len(metadata_files))
+    if cache_path is None:
+        cache_path = default_cache_path()
+
+    with phase('catalog.cache_load'):
+        cached = load_cache(cache_path) if use_cache else {}
+    entries = {}
+    catalog = SoundCatalog()
+    report = {'files': metadata_files, 'cached': 0, 'parsed': 0, 'errors': []}
+
+    for metadata_file in metadata_files:
+        try:
+            key = _file_key(metadata_file)
+            entry = cached.get(metadata_file)
+            if entry and entry.get('mtime') == key['mtime'] and entry.get('size') == key['size']:
+                report['cached'] += 1
+            else:
+                with phase('catalog.parse_json', bytes=key['size']) as p:
+                    entry = dict(key, sounds=list(parse_metadata_file(metadata_file).records()))
+                    p.add('sounds', len(entry['sounds']))
+                report['parsed'] += 1
+            entries[metadata_file] = entry
+            with phase('catalog.add_records', sounds=len(entry['sounds'])):
+                catalog.add_records(entry['sounds'])
+            if on_file:
+                on_file(metadata_file, entry['sounds'])
+        except Exception as e:
+            report['errors'].append((metadata_file, str(e)))
+
+    # Nur schreiben, wenn sich etwas geändert hat (neue, geänderte oder entfernte Dateien)
+    if use_cache and (report['parsed'] or set(entries) != set(cached)):
+        with phase('catalog.cache_save'):
+            save_cache(cache_path, entries)
+
+    return catalog, report
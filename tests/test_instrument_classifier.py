@@ -0,0 +1,36 @@
+import pytest
+
+from instrument_classifier import InstrumentClassifier, classify
+
+
+@pytest.mark.parametrize('text, category', [
+    ("Cor anglais", "Woodwinds"),
+    ("Cor", "Brass"),
+    ("Cor. 1", "Brass"),
+    ("English Horn", "Woodwinds"),
+    ("Horn in F", "Brass"),
+    ("Bassoon", "Woodwinds"),
+    ("Bass Clarinet", "Woodwinds"),
+    ("Bass Trombone", "Brass"),
+    ("Kontrabass", "Strings"),
+    ("Piccolo Trumpet", "Brass"),
+    ("Vln. I", "Strings"),
+    ("Violine", "Strings"),
+    ("Pno.", "Keys"),
+    ("Timp.", "Percussion"),
+    ("Soprano", None),
+])
+def test_classify(text, category):
+    assert classify(text) == category
+
+
+def test_abbreviations_only_match_whole_words():
+    assert classify("Trio") is None
+    assert classify("Tr.") == "Brass"
+
+
+def test_custom_keywords():
+    classifier = InstrumentClassifier({"Voices": ["soprano", "alto"]}, {"Voices": ["s", "a"]})
+    assert classifier.classify("Soprano 1") == "Voices"
+    assert classifier.classify("A.") == "Voices"
+    assert classifier.classify("Bass") is None
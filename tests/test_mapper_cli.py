@@ -0,0 +1,110 @@
+import json
+import os
+
+import pytest
+
+import mapper_cli
+from mapper_core import load_mapping_rules
+from test_mapper_core import PART_LIST, make_score
+
+
+def write_rules(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+
+def test_dry_run_creates_no_output_directories(tmp_path):
+    source = tmp_path / 'scores' / 'sub'
+    source.mkdir(parents=True)
+    (source / 'score.musicxml').write_bytes(make_score())
+    rules = write_rules(tmp_path / 'rules.json', {'keywords': {'violin': 'strings.ensemble'}})
+    output = tmp_path / 'out'
+
+    status = mapper_cli.main([str(tmp_path / 'scores'), '-r', rules, '-o', str(output),
+                              '--recursive', '-n', '-q', '-w', '1'])
+    assert status == 0
+    assert not output.exists()
+
+    status = mapper_cli.main([str(tmp_path / 'scores'), '-r', rules, '-o', str(output),
+                              '--recursive', '-q', '-w', '1'])
+    assert status == 0
+    assert (output / 'sub' / 'score.musicxml').is_file()
+
+
+@pytest.mark.parametrize('data', [
+    {'parts': []},
+    {'keywords': 'flute'},
+    {'categories': {'Brass': 3}},
+    [],
+])
+def test_invalid_rules_raise_value_error(tmp_path, data):
+    with pytest.raises(ValueError):
+        load_mapping_rules(write_rules(tmp_path / 'rules.json', data))
+
+
+def test_invalid_rules_are_reported(tmp_path, capsys):
+    (tmp_path / 'score.musicxml').write_bytes(make_score())
+    rules = write_rules(tmp_path / 'rules.json', {'parts': []})
+
+    assert mapper_cli.main([str(tmp_path), '-r', rules, '-q']) == 2
+    assert 'Fehler beim Laden' in capsys.readouterr().err
+
+
+KIT = """<part-list>
+    <score-part id="P1">
+      <part-name>Drumset</part-name>
+{instruments}
+{midi}
+    </score-part>
+  </part-list>"""
+
+
+def make_kit(members):
+    instruments = '\n'.join(
+        f'      <score-instrument id="P1-I{note}"><instrument-name>{name}</instrument-name>'
+        f'<instrument-sound>drum.group.set</instrument-sound></score-instrument>'
+        for name, note in members)
+    midi = '\n'.join(
+        f'      <midi-instrument id="P1-I{note}"><midi-unpitched>{note}</midi-unpitched></midi-instrument>'
+        for _, note in members)
+    return make_score().replace(PART_LIST.encode('utf-8'),
+                                KIT.format(instruments=instruments, midi=midi).encode('utf-8'))
+
+
+def test_unknown_kit_member_falls_through_to_rules(tmp_path):
+    from mapper_core import read_score_header
+    from mapping_profiles import MappingProfile, fingerprint
+
+    learned = tmp_path / 'learned.musicxml'
+    learned.write_bytes(make_kit([('Kick', 36), ('Snare', 39)]))
+    profile = MappingProfile(str(tmp_path / 'profile.json'))
+    part = read_score_header(str(learned)).parts[0]
+    for instrument, sound in zip(part['instruments'], ['kit.kick', 'kit.snare']):
+        profile.learn(fingerprint(part, instrument), sound)
+    profile.save()
+
+    score = tmp_path / 'scores' / 'kit.musicxml'
+    score.parent.mkdir()
+    score.write_bytes(make_kit([('Kick', 36), ('Snare', 39), ('Crash Cymbal', 50)]))
+    rules = write_rules(tmp_path / 'rules.json', {'keywords': {'cymbal': 'perc.crash'}})
+
+    assert mapper_cli.main([str(score.parent), '-r', rules, '-p', profile.path, '-q', '-w', '1']) == 0
+    instruments = read_score_header(str(score)).parts[0]['instruments']
+    assert [instrument['instrument_sound'] for instrument in instruments] == \
+        ['kit.kick', 'kit.snare', 'perc.crash']
+
+
+def test_non_scores_are_counted_as_ignored(tmp_path, capsys):
+    scores = tmp_path / 'scores'
+    scores.mkdir()
+    (scores / 'score.musicxml').write_bytes(make_score())
+    opus = b'<?xml version="1.0"?>\n<opus version="4.0"><title>Sammlung</title></opus>\n'
+    (scores / 'opus.xml').write_bytes(opus)
+    rules = write_rules(tmp_path / 'rules.json', {'keywords': {'violin': 'strings.ensemble'}})
+
+    assert mapper_cli.main([str(scores), '-r', rules, '--json', '-w', '1']) == 0
+    output = json.loads(capsys.readouterr().out)
+    statuses = {os.path.basename(result['file']): result['status'] for result in output['results']}
+    assert statuses == {'score.musicxml': 'changed', 'opus.xml': 'ignored'}
+    assert (output['summary']['changed'], output['summary']['ignored']) == (1, 1)
+    assert (scores / 'opus.xml').read_bytes() == opus
@@ -0,0 +1,382 @@
+import os
+import stat
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pytest
+
+from mapper_core import (PRESCAN_SIZE, apply_sound_mappings, prescan, read_score_header, remap_file,
+                         write_score)
+from mxl_archive import find_rootfile
+
+PART_LIST = """<part-list>
+    <score-part id="P1">
+      <part-name>Violin</part-name>
+      <score-instrument id="P1-I1">
+        <instrument-name>Violin</instrument-name>
+        <instrument-sound>strings.violin</instrument-sound>
+      </score-instrument>
+    </score-part>
+  </part-list>"""
+
+BODY = """<part id="P1"><measure number="1"><note><rest/><duration>4</duration></note></measure></part>"""
+
+
+def make_score(prolog='', root_attributes='', before_part_list=''):
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n{prolog}'
+            f'<score-partwise version="4.0"{root_attributes}>\n'
+            f'  {before_part_list}{PART_LIST}\n  {BODY}\n</score-partwise>\n').encode('utf-8')
+
+
+def remap(path, sound='strings.ensemble'):
+    header = read_score_header(str(path))
+    assert apply_sound_mappings(header, {'P1': sound}) == 1
+    write_score(header, str(path))
+    return header
+
+
+def sounds(data):
+    root = ET.fromstring(data)
+    return [elem.text for elem in root.iter() if elem.tag.endswith('instrument-sound')]
+
+
+def assert_spliced(original, written, sound='strings.ensemble'):
+    """Nur die <part-list> darf sich geändert haben."""
+    assert sounds(written) == [sound]
+    start = original.index(b'<part-list>')
+    end = original.index(b'</part-list>') + len(b'</part-list>')
+    assert written[:start] == original[:start]
+    assert written.endswith(original[end:])
+
+
+def test_splice_plain(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score()
+    path.write_bytes(original)
+    header = read_score_header(str(path))
+    assert header.part_list_span is not None
+
+    remap(path)
+    assert_spliced(original, path.read_bytes())
+
+
+def test_part_list_in_prolog_comment_is_ignored(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score(prolog='<!-- exported; see <part-list> docs -->\n')
+    path.write_bytes(original)
+    header = read_score_header(str(path))
+    start, end = header.part_list_span
+    assert original[start:end].startswith(b'<part-list>\n')
+
+    remap(path)
+    written = path.read_bytes()
+    assert b'<score-partwise version="4.0">' in written
+    assert sounds(written) == ['strings.ensemble']
+
+
+def test_part_list_in_comments_and_cdata_inside_root(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score(
+        prolog='<?generator <part-list>?>\n',
+        before_part_list='<!-- <part-list></part-list> --><work><work-title><![CDATA[<part-list>]]></work-title></work>\n  '
+    )
+    path.write_bytes(original)
+    header = read_score_header(str(path))
+    assert header.part_list_span is not None
+
+    remap(path)
+    assert sounds(path.read_bytes()) == ['strings.ensemble']
+
+
+def test_mismatching_range_falls_back_to_full_rewrite(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    # Das Entity kann im Ausschnitt nicht aufgelöst werden, also kein Splice
+    path.write_bytes(make_score(prolog='<!DOCTYPE score-partwise [ <!ENTITY v "Violin"> ]>\n')
+                     .replace(b'<part-name>Violin', b'<part-name>&v;', 1))
+    header = read_score_header(str(path))
+    assert header.part_list_span is None
+
+    remap(path)
+    assert sounds(path.read_bytes()) == ['strings.ensemble']
+
+
+def test_splice_namespaced(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score(root_attributes=' xmlns="http://www.musicxml.org/ns/partwise"')
+    path.write_bytes(original)
+    header = read_score_header(str(path))
+    assert header.part_list_span is not None
+
+    remap(path)
+    assert_spliced(original, path.read_bytes())
+
+
+def test_namespace_prefix_uses_full_rewrite(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    data = make_score(root_attributes=' xmlns:mx="http://www.musicxml.org/ns/partwise"')
+    data = data.replace(b'<', b'<mx:').replace(b'<mx:/', b'</mx:').replace(b'<mx:?', b'<?')
+    path.write_bytes(data)
+    header = read_score_header(str(path))
+    assert header.part_list_span is None
+
+    remap(path)
+    assert sounds(path.read_bytes()) == ['strings.ensemble']
+
+
+def write_mxl(path, score):
+    container = ('<?xml version="1.0" encoding="UTF-8"?><container><rootfiles>'
+                 '<rootfile full-path="score.musicxml"/></rootfiles></container>')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('mimetype', 'application/vnd.recordare.musicxml', zipfile.ZIP_STORED)
+        zf.writestr('META-INF/container.xml', container)
+        zf.writestr('score.musicxml', score)
+        zf.writestr('cover.txt', 'unverändert')
+
+
+def test_splice_mxl(tmp_path):
+    path = tmp_path / 'score.mxl'
+    original = make_score(prolog='<!-- <part-list> -->\n')
+    write_mxl(path, original)
+
+    remap(path)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ['mimetype', 'META-INF/container.xml', 'score.musicxml', 'cover.txt']
+        assert find_rootfile(zf) == 'score.musicxml'
+        assert zf.read('cover.txt').decode('utf-8') == 'unverändert'
+        assert_spliced(original, zf.read('score.musicxml'))
+
+
+def test_write_to_new_file_keeps_source(tmp_path):
+    source = tmp_path / 'score.musicxml'
+    target = tmp_path / 'out.musicxml'
+    original = make_score()
+    source.write_bytes(original)
+    header = read_score_header(str(source))
+    apply_sound_mappings(header, {'P1': 'strings.ensemble'})
+    write_score(header, str(target))
+
+    assert source.read_bytes() == original
+    assert_spliced(original, target.read_bytes())
+
+
+def test_new_file_gets_default_mode(tmp_path):
+    source = tmp_path / 'score.musicxml'
+    target = tmp_path / 'out.musicxml'
+    source.write_bytes(make_score())
+    umask = os.umask(0o022)
+    os.umask(umask)
+
+    header = read_score_header(str(source))
+    write_score(header, str(target))
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o666 & ~umask
+
+
+def test_existing_file_keeps_mode(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    path.write_bytes(make_score())
+    os.chmod(path, 0o640)
+    remap(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+
+def test_write_through_symlink(tmp_path):
+    real = tmp_path / 'real.musicxml'
+    link = tmp_path / 'link.musicxml'
+    original = make_score()
+    real.write_bytes(original)
+    link.symlink_to(real)
+
+    remap(link)
+    assert link.is_symlink()
+    assert_spliced(original, real.read_bytes())
+
+
+def test_reused_header_reflects_saved_sounds(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    path.write_bytes(make_score())
+    header = remap(path)
+
+    assert header.is_current()
+    assert header.parts == read_score_header(str(path)).parts
+    assert header.parts[0]['instrument_sound'] == 'strings.ensemble'
+    assert header.parts[0]['instruments'][0]['instrument_sound'] == 'strings.ensemble'
+
+
+def test_kit_members_report_midi_unpitched(tmp_path):
+    path = tmp_path / 'kit.musicxml'
+    kit = """<part-list>
+    <score-part id="P1">
+      <part-name>Drumset</part-name>
+      <score-instrument id="P1-I36"><instrument-name>Drum</instrument-name></score-instrument>
+      <score-instrument id="P1-I39"><instrument-name>Drum</instrument-name></score-instrument>
+      <midi-instrument id="P1-I36"><midi-channel>10</midi-channel><midi-unpitched>37</midi-unpitched></midi-instrument>
+      <midi-instrument id="P1-I39"><midi-channel>10</midi-channel><midi-unpitched>39</midi-unpitched></midi-instrument>
+    </score-part>
+  </part-list>"""
+    path.write_bytes(make_score().replace(PART_LIST.encode('utf-8'), kit.encode('utf-8')))
+    instruments = read_score_header(str(path)).parts[0]['instruments']
+    assert [(i['instrument_id'], i['midi_unpitched']) for i in instruments] == \
+        [('P1-I36', '37'), ('P1-I39', '39')]
+
+
+@pytest.mark.parametrize('name', ['score.musicxml', 'score.mxl'])
+def test_changed_source_is_not_spliced(tmp_path, name):
+    path = tmp_path / name
+    if name.endswith('.mxl'):
+        write_mxl(path, make_score())
+    else:
+        path.write_bytes(make_score())
+    header = read_score_header(str(path))
+
+    # Die Datei ändert sich zwischen Analyse und Speichern (z.B. neuer Export)
+    changed = make_score(before_part_list='<work><work-title>Neu</work-title></work>\n  ')
+    if name.endswith('.mxl'):
+        write_mxl(path, changed)
+    else:
+        path.write_bytes(changed)
+    before = path.read_bytes()
+
+    apply_sound_mappings(header, {'P1': 'strings.ensemble'})
+    with pytest.raises(ValueError):
+        write_score(header, str(path))
+    assert path.read_bytes() == before
+    assert not header.is_current()
+
+
+def test_same_stamp_but_moved_part_list_is_detected(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score(before_part_list='<!--x-->')
+    path.write_bytes(original)
+    stat_before = os.stat(path)
+    header = read_score_header(str(path))
+
+    # Gleiche Größe und Änderungszeit, aber die <part-list> ist verschoben
+    path.write_bytes(original.replace(b'<!--x-->', b'').replace(b'</part-list>', b'</part-list>        '))
+    os.utime(path, ns=(stat_before.st_atime_ns, stat_before.st_mtime_ns))
+    assert header.is_current()
+
+    apply_sound_mappings(header, {'P1': 'strings.ensemble'})
+    with pytest.raises(ValueError):
+        write_score(header, str(path))
+
+
+def test_splice_keeps_comments_and_crlf(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score().replace(
+        b'<part-name>Violin</part-name>', b'<!-- Solo -->\n      <part-name>Violin</part-name>'
+    ).replace(b'\n', b'\r\n')
+    path.write_bytes(original)
+
+    remap(path)
+    assert path.read_bytes() == original.replace(b'>strings.violin<', b'>strings.ensemble<')
+
+
+def test_missing_instrument_sound_is_inserted_with_indentation(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score().replace(
+        b'\n        <instrument-sound>strings.violin</instrument-sound>', b''
+    ).replace(b'\n', b'\r\n')
+    path.write_bytes(original)
+
+    remap(path, 'strings.a&b')
+    expected = original.replace(
+        b'<instrument-name>Violin</instrument-name>',
+        b'<instrument-name>Violin</instrument-name>\r\n        '
+        b'<instrument-sound>strings.a&amp;b</instrument-sound>'
+    )
+    assert path.read_bytes() == expected
+    assert sounds(expected) == ['strings.a&b']
+
+
+def test_empty_instrument_sound_is_filled(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score().replace(b'<instrument-sound>strings.violin</instrument-sound>',
+                                    b'<instrument-sound/>')
+    path.write_bytes(original)
+
+    remap(path)
+    assert path.read_bytes() == original.replace(
+        b'<instrument-sound/>', b'<instrument-sound>strings.ensemble</instrument-sound>')
+
+
+def test_instrument_sound_without_instrument_name_goes_first(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score().replace(
+        b'<instrument-name>Violin</instrument-name>\n        <instrument-sound>strings.violin</instrument-sound>',
+        b'<ensemble/>')
+    path.write_bytes(original)
+
+    remap(path)
+    assert path.read_bytes() == original.replace(
+        b'<ensemble/>', b'<instrument-sound>strings.ensemble</instrument-sound>\n        <ensemble/>')
+
+
+# Wie von load_mapping_rules() geliefert
+RULES = {'parts': {}, 'keywords': {'violin': 'strings.ensemble'}, 'categories': {}}
+
+
+@pytest.mark.parametrize('document, root, doctype', [
+    (b'<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE opus PUBLIC "-//Recordare//DTD MusicXML 4.0 Opus//EN"'
+     b' "http://www.musicxml.org/dtds/opus.dtd">\n<opus version="4.0"><title>Sammlung</title></opus>\n',
+     'opus', '-//Recordare//DTD MusicXML 4.0 Opus//EN'),
+    (b'<!DOCTYPE html>\n<html><body><p>score-partwise</p></body></html>\n', 'html', 'html'),
+])
+def test_prescan_rejects_non_score_root(tmp_path, document, root, doctype):
+    path = tmp_path / 'other.xml'
+    path.write_bytes(document)
+    scan = prescan(str(path))
+    assert (scan['root'], scan['doctype'], scan['score']) == (root, doctype, False)
+
+    result = remap_file(str(path), RULES)
+    assert result['status'] == 'ignored'
+    assert f'<{root}>' in result['reason']
+    assert path.read_bytes() == document
+
+
+@pytest.mark.parametrize('encoding, bom', [
+    ('utf-16-le', b'\xff\xfe'),
+    ('utf-16-be', b'\xfe\xff'),
+    ('utf-16-le', b''),
+    ('utf-16-be', b''),
+])
+def test_prescan_utf16(tmp_path, encoding, bom):
+    path = tmp_path / 'score.musicxml'
+    text = make_score(prolog='<!-- Export -->\n').decode('utf-8').replace('UTF-8', 'UTF-16')
+    path.write_bytes(bom + text.encode(encoding))
+    scan = prescan(str(path))
+    assert (scan['root'], scan['score']) == ('score-partwise', True)
+
+
+def test_prescan_undecided_for_long_prolog(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    comment = '<!-- ' + 'x' * PRESCAN_SIZE + ' -->\n'
+    path.write_bytes(make_score(prolog=comment))
+    assert prescan(str(path))['score'] is None
+
+    # Ohne Urteil entscheidet das normale Lesen
+    result = remap_file(str(path), RULES)
+    assert result['status'] == 'changed'
+    assert sounds(path.read_bytes()) == ['strings.ensemble']
+
+
+@pytest.mark.parametrize('root_tag, namespace', [
+    ('<mx:score-partwise xmlns:mx="http://www.musicxml.org/ns" version="4.0">', 'http://www.musicxml.org/ns'),
+    ('<score-timewise xmlns="http://www.musicxml.org/ns">', 'http://www.musicxml.org/ns'),
+    ('<score-partwise version="4.0">', None),
+])
+def test_prescan_namespaced_root(tmp_path, root_tag, namespace):
+    path = tmp_path / 'score.musicxml'
+    path.write_bytes(('<?xml version="1.0"?>\n<?generator x?>\n' + root_tag).encode('utf-8'))
+    scan = prescan(str(path))
+    assert scan['root'] in ('score-partwise', 'score-timewise')
+    assert (scan['namespace'], scan['score']) == (namespace, True)
+
+
+def test_prescan_text_before_root_is_not_xml(tmp_path):
+    path = tmp_path / 'notes.musicxml'
+    path.write_bytes(b'kein XML <score-partwise>')
+    scan = prescan(str(path))
+    assert (scan['root'], scan['score']) == (None, False)
+    result = remap_file(str(path), None)
+    assert (result['status'], result['reason']) == ('ignored', 'kein XML')
@@ -0,0 +1,122 @@
+import os
+
+import mapper_watch
+from mapper_core import load_mapping_rules, read_score_header
+from mapper_watch import FolderWatcher, WatchState, scan_folder
+from test_mapper_core import make_score
+
+
+def write_rules(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text('{"keywords": {"violin": "strings.ensemble"}}', encoding='utf-8')
+    return load_mapping_rules(str(path))
+
+
+def run_once(tmp_path, root, state_name='state.sqlite', **options):
+    results = []
+    state = WatchState(str(tmp_path / state_name))
+    try:
+        watcher = FolderWatcher(str(root), write_rules(tmp_path), state=state, workers=1,
+                                on_result=results.append, **options)
+        counts = watcher.run(once=True)
+    finally:
+        state.close()
+    return counts, results
+
+
+def test_output_dir_inside_watched_folder_is_not_scanned(tmp_path):
+    root = tmp_path / 'in'
+    root.mkdir()
+    (root / 'score.musicxml').write_bytes(make_score())
+    output = root / 'out'
+
+    # Ohne gespeicherten Zustand würde jede eigene Ausgabe erneut verarbeitet
+    for run in range(3):
+        counts, results = run_once(tmp_path, root, f'state{run}.sqlite', output_dir=str(output),
+                                   recursive=True)
+        assert [os.path.basename(result['file']) for result in results] == ['score.musicxml']
+
+    assert sorted(os.listdir(output)) == ['score.musicxml']
+    assert scan_folder(str(root), True, [os.path.realpath(str(output))]) == [str(root / 'score.musicxml')]
+
+
+def test_output_dir_equal_to_folder_is_rejected(tmp_path, capsys):
+    root = tmp_path / 'in'
+    root.mkdir()
+    assert mapper_watch.main([str(root), '-o', str(root), '-r', str(tmp_path / 'x.json')]) == 2
+    assert 'Ausgabeverzeichnis' in capsys.readouterr().err
+
+
+def test_own_writes_are_not_processed_again(tmp_path):
+    root = tmp_path / 'in'
+    root.mkdir()
+    path = root / 'score.musicxml'
+    path.write_bytes(make_score())
+
+    counts, results = run_once(tmp_path, root)
+    assert counts['changed'] == 1
+    written = path.read_bytes()
+
+    # Die eigene Änderung ist als Endzustand gespeichert
+    counts, results = run_once(tmp_path, root)
+    assert results == [] and counts['changed'] == counts['skipped'] == 0
+    assert path.read_bytes() == written
+
+
+def test_copy_of_processed_content_is_skipped_by_digest(tmp_path):
+    root = tmp_path / 'in'
+    root.mkdir()
+    (root / 'a.musicxml').write_bytes(make_score())
+    run_once(tmp_path, root)
+
+    (root / 'b.musicxml').write_bytes((root / 'a.musicxml').read_bytes())
+    counts, results = run_once(tmp_path, root)
+    assert results == []
+    assert counts['skipped'] == 1
+
+
+def test_output_dir_records_source_without_digest(tmp_path):
+    root = tmp_path / 'in'
+    root.mkdir()
+    source = root / 'score.musicxml'
+    source.write_bytes(make_score())
+    output = tmp_path / 'out'
+
+    counts, _ = run_once(tmp_path, root, output_dir=str(output))
+    assert counts['changed'] == 1
+    state = WatchState(str(tmp_path / 'state.sqlite'))
+    try:
+        # Die Quelle bleibt unverändert und darf nicht als zugeordnet gelten
+        assert not state.has_digest(mapper_watch.file_digest(str(source)))
+        assert state.is_current(str(source), mapper_watch.file_stamp(str(source)))
+    finally:
+        state.close()
+
+    counts, results = run_once(tmp_path, root, output_dir=str(output))
+    assert results == []
+
+    # Eine geänderte Quelle wird erneut verarbeitet
+    source.write_bytes(make_score(prolog='<!-- neu -->\n'))
+    counts, results = run_once(tmp_path, root, output_dir=str(output))
+    assert counts['changed'] == 1
+    assert b'<!-- neu -->' in (output / 'score.musicxml').read_bytes()
+
+
+def test_polling_watcher_reports_new_and_changed_files(tmp_path):
+    root = tmp_path / 'in'
+    output = root / 'out'
+    output.mkdir(parents=True)
+    existing = root / 'a.musicxml'
+    existing.write_bytes(make_score())
+    watcher = mapper_watch.PollingWatcher(str(root), recursive=True, interval=0,
+                                          excluded=[os.path.realpath(str(output))])
+
+    assert watcher.poll(0) == []
+    (root / 'b.musicxml').write_bytes(make_score())
+    (root / 'notes.txt').write_text('x', encoding='utf-8')
+    (output / 'c.musicxml').write_bytes(make_score())
+    assert watcher.poll(0) == [str(root / 'b.musicxml')]
+
+    existing.write_bytes(make_score(prolog='<!-- geändert -->\n'))
+    assert watcher.poll(0) == [str(existing)]
+    assert watcher.poll(0) == []
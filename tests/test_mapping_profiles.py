@@ -0,0 +1,67 @@
+import json
+
+from mapping_profiles import MappingProfile, fingerprint
+
+
+def kit_part():
+    members = [('P1-I36', 'Drum', '37'), ('P1-I39', 'Drum', '39'), ('P1-I50', None, '51')]
+    return {
+        'part_id': 'P1',
+        'part_name': 'Drumset',
+        'instrument_sound': 'drum.group.set',
+        'instruments': [
+            {'instrument_id': instrument_id, 'instrument_name': name,
+             'instrument_sound': 'drum.group.set', 'midi_unpitched': note}
+            for instrument_id, name, note in members
+        ]
+    }
+
+
+def test_kit_members_with_same_name_stay_distinct(tmp_path):
+    part = kit_part()
+    profile = MappingProfile(str(tmp_path / 'profile.json'))
+    for instrument, sound in zip(part['instruments'], ['kit.kick', 'kit.snare', 'kit.ride']):
+        profile.learn(fingerprint(part, instrument), sound)
+    profile.save()
+
+    loaded = MappingProfile.load(str(tmp_path / 'profile.json'))
+    assert len(loaded) == 3
+    assert [loaded.lookup(fingerprint(part, instrument)) for instrument in part['instruments']] == \
+        ['kit.kick', 'kit.snare', 'kit.ride']
+
+
+def test_profile_without_midi_unpitched_still_matches(tmp_path):
+    path = tmp_path / 'profile.json'
+    path.write_text(json.dumps({'version': 1, 'entries': [
+        {'part_name': 'violin i', 'instrument_name': 'violin', 'instrument_sound': 'strings.violin',
+         'sound': 'strings.violin.berlin'}
+    ]}), encoding='utf-8')
+    part = {'part_id': 'P1', 'part_name': 'Violin I', 'instrument_sound': 'strings.violin',
+            'instruments': [{'instrument_id': 'P1-I1', 'instrument_name': 'Violin',
+                             'instrument_sound': 'strings.violin', 'midi_unpitched': None}]}
+
+    assert MappingProfile.load(str(path)).lookup(fingerprint(part)) == 'strings.violin.berlin'
+
+
+def test_single_part_falls_back_to_part_name():
+    violin = {'part_id': 'P1', 'part_name': 'Violin I', 'instrument_sound': 'strings.violin',
+              'instruments': [{'instrument_id': 'P1-I1', 'instrument_name': 'Violin',
+                               'instrument_sound': 'strings.violin', 'midi_unpitched': None}]}
+    profile = MappingProfile()
+    profile.learn(fingerprint(violin), 'strings.violin.berlin')
+
+    other = dict(violin, instruments=[dict(violin['instruments'][0], instrument_name='Vl.',
+                                           instrument_sound='strings.viola')])
+    assert profile.lookup(fingerprint(other)) == 'strings.violin.berlin'
+
+
+def test_unknown_kit_member_does_not_inherit_sounds():
+    part = kit_part()
+    profile = MappingProfile()
+    profile.learn(fingerprint(part, part['instruments'][0]), 'kit.kick')
+
+    crash = {'instrument_id': 'P1-I50', 'instrument_name': 'Crash Cymbal',
+             'instrument_sound': 'drum.group.set', 'midi_unpitched': '50'}
+    assert profile.lookup(fingerprint(part, crash)) is None
+    assert profile.lookup(fingerprint(part, part['instruments'][1])) is None
+    assert profile.lookup(fingerprint(part, part['instruments'][0])) == 'kit.kick'
@@ -0,0 +1,106 @@
+import os
+import zipfile
+
+from mapper_core import apply_sound_mappings, read_score_header, write_score
+from undo_journal import UndoJournal, read_journal, rollback
+
+from test_mapper_core import make_score, sounds, write_mxl
+
+
+def remap_with_journal(path, journal, sound='strings.ensemble', full_rewrite=False):
+    header = read_score_header(str(path))
+    if full_rewrite:
+        # Byte-Bereich unbekannt: die Datei wird komplett neu geschrieben
+        header.part_list_span = None
+    assert apply_sound_mappings(header, {'P1': sound}) == 1
+    write_score(header, str(path), journal)
+
+
+def test_rollback_restores_span(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score()
+    path.write_bytes(original)
+    journal_path = tmp_path / 'run.jsonl'
+    remap_with_journal(path, UndoJournal(str(journal_path)))
+    assert sounds(path.read_bytes()) == ['strings.ensemble']
+    entry, = read_journal(str(journal_path))
+    assert 'original' in entry and 'original_file' not in entry
+
+    results = rollback(str(journal_path))
+    assert [r['status'] for r in results] == ['restored']
+    assert path.read_bytes() == original
+
+
+def test_rollback_restores_mxl_member(tmp_path):
+    path = tmp_path / 'score.mxl'
+    score = make_score()
+    write_mxl(path, score)
+    journal_path = tmp_path / 'run.jsonl'
+    remap_with_journal(path, UndoJournal(str(journal_path)))
+    assert read_journal(str(journal_path))[0]['member']
+
+    results = rollback(str(journal_path))
+    assert [r['status'] for r in results] == ['restored']
+    with zipfile.ZipFile(path) as zf:
+        assert zf.read('score.musicxml') == score
+        assert zf.read('cover.txt').decode('utf-8') == 'unverändert'
+
+
+def test_rollback_restores_full_file_entry(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score()
+    path.write_bytes(original)
+    journal_path = tmp_path / 'run.jsonl'
+    remap_with_journal(path, UndoJournal(str(journal_path)), full_rewrite=True)
+    entry, = read_journal(str(journal_path))
+    assert 'original_file' in entry
+
+    results = rollback(str(journal_path))
+    assert [r['status'] for r in results] == ['restored']
+    assert path.read_bytes() == original
+
+
+def test_rollback_skips_files_changed_since_run(tmp_path):
+    journal_path = tmp_path / 'run.jsonl'
+    journal = UndoJournal(str(journal_path))
+    span_path = tmp_path / 'span.musicxml'
+    full_path = tmp_path / 'full.musicxml'
+    for path in (span_path, full_path):
+        path.write_bytes(make_score())
+    remap_with_journal(span_path, journal)
+    remap_with_journal(full_path, journal, full_rewrite=True)
+    # Nach dem Lauf erneut geändert
+    remap_with_journal(span_path, None, sound='strings.viola')
+    remap_with_journal(full_path, None, sound='strings.viola')
+    changed = {path: path.read_bytes() for path in (span_path, full_path)}
+
+    results = rollback(str(journal_path))
+    assert [r['status'] for r in results] == ['skipped', 'skipped']
+    for path, data in changed.items():
+        assert path.read_bytes() == data
+
+
+def test_rollback_skips_missing_file(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    path.write_bytes(make_score())
+    journal_path = tmp_path / 'run.jsonl'
+    remap_with_journal(path, UndoJournal(str(journal_path)))
+    os.remove(path)
+
+    assert [r['status'] for r in rollback(str(journal_path))] == ['skipped']
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = tmp_path / 'score.musicxml'
+    original = make_score()
+    path.write_bytes(original)
+    journal_path = tmp_path / 'run.jsonl'
+    remap_with_journal(path, UndoJournal(str(journal_path)))
+    # Absturz mitten im Schreiben des nächsten Eintrags
+    with open(journal_path, 'ab') as f:
+        f.write(b'{"file": "/tmp/other.musicxml", "member": nu')
+
+    assert len(read_journal(str(journal_path))) == 1
+    results = rollback(str(journal_path))
+    assert [r['status'] for r in results] == ['restored']
+    assert path.read_bytes() == original
@@ -0,0 +1,124 @@
+"""Undo-Journal für überschriebene Partituren.
+
+Vor jedem Überschreiben wird eine Zeile (JSON) an das Journal angehängt. Sie
+enthält nur die ursprünglichen Bytes der <part-list> und wo sie stehen, nicht
+die ganze Datei; nur wenn die Datei komplett neu geschrieben werden musste,
+wird sie komprimiert vollständig gesichert. Der Eintrag wird per fsync
+gesichert, bevor die Datei ersetzt wird, sodass auch ein Absturz mitten im
+Lauf rückgängig gemacht werden kann.
+
+Beim Zurückrollen wird jede Datei nur wiederhergestellt, wenn sie noch genau
+den protokollierten neuen Inhalt hat; später geänderte Dateien bleiben unberührt.
+"""
+import base64
+import hashlib
+import json
+import os
+import zlib
+
+from atomic_io import atomic_write, file_digest
+from mapper_core import read_span, replace_span
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+class UndoJournal:
+    """Hängt Einträge an eine JSON-Lines-Datei an (auch aus mehreren Prozessen)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _append(self, entry):
+        line = (json.dumps(entry, ensure_ascii=True) + '\n').encode('ascii')
+        # O_APPEND: Zeilen paralleler Worker-Prozesse werden nicht vermischt
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def record_span(self, file_path, archive_member, start, original, replacement):
+        """Protokolliert das Ersetzen der <part-list> (original -> replacement) ab start."""
+        self._append({
+            'file': os.path.abspath(file_path),
+            'member': archive_member,
+            'start': start,
+            'length': len(replacement),
+            'sha256': _digest(replacement),
+            'original': _encode(original)
+        })
+
+    def record_file(self, file_path, new_path):
+        """Sichert die komplette Datei, wenn kein Byte-Bereich bekannt ist."""
+        with open(file_path, 'rb') as f:
+            original = f.read()
+        self._append({
+            'file': os.path.abspath(file_path),
+            'sha256': file_digest(new_path),
+            'original_file': _encode(zlib.compress(original))
+        })
+
+
+def read_journal(journal_path):
+    """Liest alle vollständigen Einträge; eine abgebrochene letzte Zeile wird ignoriert."""
+    entries = []
+    with open(journal_path, 'r', encoding='ascii') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def rollback(journal_path, on_result=None):
+    """Stellt alle Dateien aus dem Journal wieder her (neueste Einträge zuerst).
+
+    Liefert Ergebnis-Dicts mit 'file' und 'status' ('restored', 'skipped'
+    für inzwischen geänderte oder nie ersetzte Dateien, 'error').
+    """
+    results = []
+    for entry in reversed(read_journal(journal_path)):
+        result = {'file': entry.get('file'), 'status': 'restored', 'error': None}
+        try:
+            if not _restore(entry):
+                result['status'] = 'skipped'
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = str(e)
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return results
+
+
+def _restore(entry):
+    file_path = entry['file']
+    if not os.path.exists(file_path):
+        return False
+
+    if 'original_file' in entry:
+        if file_digest(file_path) != entry['sha256']:
+            return False
+        original = zlib.decompress(base64.b64decode(entry['original_file']))
+
+        def produce(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(original)
+
+        atomic_write(file_path, produce)
+        return True
+
+    current = read_span(file_path, entry['member'], entry['start'], entry['length'])
+    if _digest(current) != entry['sha256']:
+        return False
+    replace_span(file_path, entry['member'], entry['start'], entry['length'],
+                 base64.b64decode(entry['original']))
+    return True